@@ -0,0 +1,102 @@
+"""
+Admission control: bounded concurrency per expensive stage, with load shedding.
+
+Each stage (embedding, qdrant, sympy, llm) has a fixed number of slots and a
+short bounded queue. A call that finds the queue full - or waits longer than
+ADMISSION_QUEUE_TIMEOUT for a slot - raises `Overloaded`, which the API turns
+into 503 with Retry-After instead of letting every request slow down together.
+
+Cheap work never takes a slot: guardrail rejections, exact arithmetic and
+answer-cache hits are answered before any limited stage runs, so they keep
+flowing while the expensive stages are saturated.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2.0))
+RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 2))
+
+_CPUS = os.cpu_count() or 2
+# stage: (default concurrency, default queue length)
+_DEFAULTS = {
+    "embedding": (2, 16),
+    "qdrant": (16, 64),
+    "sympy": (_CPUS, 2 * _CPUS),
+    "llm": (2, 4),
+}
+
+
+class Overloaded(Exception):
+    """A stage is at capacity; the caller should retry after `retry_after` seconds."""
+
+    def __init__(self, stage: str, retry_after: int = RETRY_AFTER):
+        super().__init__(f"{stage} stage is overloaded")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StageLimiter:
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float = QUEUE_TIMEOUT):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def _shed(self):
+        metrics.incr(f"admission.shed.{self.name}")
+        logger.warning(f"🚦 {self.name} stage overloaded; shedding request")
+        raise Overloaded(self.name)
+
+    @contextmanager
+    def slot(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.queue:
+                    self._shed()
+                self._waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                self._shed()
+            metrics.incr(f"admission.queued.{self.name}")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {"concurrency": self.concurrency, "queue": self.queue, "waiting": self._waiting}
+
+
+def _limiter(stage: str) -> StageLimiter:
+    concurrency, queue = _DEFAULTS[stage]
+    prefix = f"ADMISSION_{stage.upper()}"
+    return StageLimiter(
+        stage,
+        int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        int(os.getenv(f"{prefix}_QUEUE", queue)),
+    )
+
+
+limiters = {stage: _limiter(stage) for stage in _DEFAULTS}
+
+
+def limit(stage: str):
+    """Context manager holding one slot of `stage` (raises Overloaded)."""
+    return limiters[stage].slot()
+
+
+def admission_stats() -> dict:
+    return {stage: l.stats() for stage, l in limiters.items()}
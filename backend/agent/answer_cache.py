@@ -0,0 +1,120 @@
+"""
+Answer cache shared by every worker process.
+
+`route_question` results are stored in a local SQLite database in WAL mode,
+so all uvicorn workers on a host read and write the same cache and it
+survives restarts. Entries expire after a TTL, the table is trimmed to a
+maximum size, and each entry records the KB version it was computed against
+so a KB rebuild invalidates everything cached before it.
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv(
+    "ANSWER_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "answer_cache.sqlite3"),
+)
+CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 50000))
+CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+
+# Trimming scans the table, so only every Nth write pays for it.
+_EVICT_EVERY = 200
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form used to key caches: case, spacing and trailing punctuation."""
+    q = question.replace("²", "^2").replace("³", "^3")
+    q = _WHITESPACE_RE.sub(" ", q.lower()).strip()
+    return q.rstrip("?.! ")
+
+
+class AnswerCache:
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        # next() on a count is atomic, so concurrent writers never share a number.
+        self._writes = itertools.count(1)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and per process: sqlite3 connections must
+        # not cross threads, and must never be inherited across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY,"
+            " kb_version TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers(created)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+
+    def get(self, question: str, kb_version: str) -> Optional[dict]:
+        try:
+            row = self._conn().execute(
+                "SELECT result FROM answers WHERE key = ? AND kb_version = ? AND created > ?",
+                (self._key(question), kb_version, time.time() - self.ttl),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Answer cache read failed: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, question: str, kb_version: str, result: dict):
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, kb_version, result, created) VALUES (?, ?, ?, ?)",
+                (self._key(question), kb_version, json.dumps(result), time.time()),
+            )
+            if next(self._writes) % _EVICT_EVERY == 0:
+                self.evict(kb_version)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Answer cache write failed: {e}")
+
+    def evict(self, kb_version: str):
+        """Drop expired and stale-version entries, then trim to `max_entries`."""
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM answers WHERE created <= ? OR kb_version != ?",
+            (time.time() - self.ttl, kb_version),
+        )
+        conn.execute(
+            "DELETE FROM answers WHERE key IN ("
+            " SELECT key FROM answers ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM answers")
+
+
+answer_cache = AnswerCache() if CACHE_ENABLED else None
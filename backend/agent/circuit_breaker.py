@@ -0,0 +1,104 @@
+"""
+Circuit breakers for remote dependencies (Qdrant, Ollama, Tavily).
+
+After CIRCUIT_FAILURE_THRESHOLD consecutive failures a breaker opens and calls
+fail immediately with `CircuitOpen` instead of waiting for a timeout. Once
+CIRCUIT_RESET_TIMEOUT seconds have passed it lets a single probe call through
+(half-open): success closes it again, failure re-opens it for another period.
+State changes and rejected calls are counted in metrics, and /metrics lists
+the current state of every breaker so degraded mode is visible.
+"""
+import logging
+import os
+import threading
+import time
+
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30.0))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """The dependency is known to be down; the call was not attempted."""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} circuit is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Cheap check that doesn't claim the half-open probe."""
+        return self.state != OPEN or time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                logger.info(f"🔌 {self.name} circuit half-open; probing")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"✅ {self.name} circuit closed")
+                metrics.incr(f"breaker.{self.name}.closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.error(f"❌ {self.name} circuit opened after {self.failures} failures")
+                    metrics.incr(f"breaker.{self.name}.opened")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn` through the breaker; raises CircuitOpen without calling it when open."""
+        if not self._allow():
+            metrics.incr(f"breaker.{self.name}.rejected")
+            raise CircuitOpen(self.name)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+breakers = {name: CircuitBreaker(name) for name in ("qdrant", "ollama", "tavily")}
+
+
+def breaker_stats() -> dict:
+    return {name: b.stats() for name, b in breakers.items()}
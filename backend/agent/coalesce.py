@@ -0,0 +1,76 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When many clients ask the same question at once (a whole class submitting the
+assigned problem), only the first request runs the pipeline; the others await
+the same computation and receive its result or its exception. The computation
+runs as its own task and every caller awaits it through `asyncio.shield`, so a
+client that disconnects only cancels its own wait - the remaining callers
+still get the answer. Nothing is cached after completion; that is the answer
+cache's job.
+
+The computation gets its own Deadline rather than the first caller's: it
+starts with the first caller's expiry, is extended whenever a caller with a
+later deadline joins, and is cancelled only once every caller has stopped
+waiting. A caller timing out or disconnecting never cuts the run short for
+the others.
+"""
+import asyncio
+import logging
+
+from agent.deadline import Deadline
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self, task, deadline: Deadline):
+        self.task = task
+        self.deadline = deadline
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str = "coalesce"):
+        self.name = name
+        self._inflight = {}
+
+    async def run(self, key: str, make_coro, deadline: Deadline = None):
+        """
+        Await the in-flight computation for `key`, starting it with
+        `make_coro(shared_deadline)` if there is none. The shared deadline
+        lasts as long as the latest `deadline` of the callers still waiting.
+        """
+        deadline = deadline or Deadline()
+        flight = self._inflight.get(key)
+        if flight is None:
+            shared = Deadline.until(deadline.expires_at)
+            flight = _Flight(asyncio.ensure_future(make_coro(shared)), shared)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda t, k=key: self._finished(k, t))
+            metrics.incr(f"{self.name}.leader")
+        else:
+            flight.deadline.extend(deadline.expires_at)
+            metrics.incr(f"{self.name}.joined")
+            logger.info(f"🔗 Joined in-flight request for {key[:60]!r}")
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting any more: start no further stages.
+                flight.deadline.cancel()
+                metrics.incr(f"{self.name}.abandoned")
+
+    def _finished(self, key: str, task):
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter has gone away.
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self):
+        return len(self._inflight)
@@ -0,0 +1,242 @@
+"""
+Feedback-driven KB curation.
+
+Reads the feedback log (agent/feedback.py) incrementally from the offset
+saved in its state file, joins each rating to what produced the answer (the
+answer cache entry for the question) and keeps running rating totals per KB
+point and per solver answer. Attribution is never taken from the feedback
+body: a rating counts only when the server answered the question itself, a
+`kb_point_id` the client sends must match the cached one, and solver answers
+are promoted from the cache with votes keyed on the cached answer. So a
+client can neither quarantine an arbitrary KB point nor get its own text
+promoted. Ratings without a cached answer are reported as unattributed. Then:
+
+- KB points rated at least CURATION_MIN_VOTES times with a mean at or below
+  CURATION_QUARANTINE_MEAN are quarantined (excluded from every search);
+  at or below CURATION_DEMOTE_MEAN they are demoted (a score penalty).
+- Solver answers (sympy, transform, ...) rated at least
+  CURATION_PROMOTE_MIN_VOTES times with a mean at or above
+  CURATION_PROMOTE_MEAN are promoted into the collection, so the question is
+  answered from the KB next time instead of by the slow path.
+
+Any change bumps the KB version, invalidating the caches built on it. The
+report estimates the KB hit-rate change over the rated traffic seen so far.
+Run it periodically with scripts/curate_kb.py.
+"""
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from agent.answer_cache import answer_cache, normalize_question
+from agent.doc_store import store_documents
+from agent.feedback import FEEDBACK_LOG, read_feedback
+from agent.kb_client import QDRANT_URL
+from agent.kb_schema import ensure_payload_indexes
+from agent.kb_version import bump_kb_version, get_kb_version
+from agent.knowledge_base import generate_embedding
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH = os.getenv(
+    "CURATION_STATE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "curation_state.json"),
+)
+MIN_VOTES = int(os.getenv("CURATION_MIN_VOTES", 3))
+QUARANTINE_MEAN = float(os.getenv("CURATION_QUARANTINE_MEAN", 1.5))
+DEMOTE_MEAN = float(os.getenv("CURATION_DEMOTE_MEAN", 2.5))
+DEMOTE_PENALTY = float(os.getenv("CURATION_DEMOTE_PENALTY", 0.1))
+PROMOTE_MIN_VOTES = int(os.getenv("CURATION_PROMOTE_MIN_VOTES", 2))
+PROMOTE_MEAN = float(os.getenv("CURATION_PROMOTE_MEAN", 4.5))
+
+# Answer sources worth promoting: slow paths a KB hit would short-circuit.
+PROMOTABLE_SOURCES = {"sympy", "transform", "web", "llm"}
+
+
+def _empty_state() -> dict:
+    return {"offset": 0, "rated": 0, "kb_rated": 0, "kb": {}, "candidates": {},
+            "quarantined": [], "demoted": [], "promoted": []}
+
+
+def load_state(path: str = STATE_PATH) -> dict:
+    try:
+        with open(path, "r") as f:
+            return {**_empty_state(), **json.load(f)}
+    except (OSError, json.JSONDecodeError):
+        return _empty_state()
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _served(entry: dict, kb_version: str):
+    """The server's own answer to the rated question (its answer cache entry), or None."""
+    if not answer_cache:
+        return None
+    return answer_cache.get(entry.get("question", ""), kb_version)
+
+
+def _candidate_key(question: str, served: dict) -> str:
+    digest = hashlib.sha1(json.dumps([served.get("answer", ""), served.get("solution", "")]).encode("utf-8"))
+    return f"{normalize_question(question)}|{digest.hexdigest()[:16]}"
+
+
+def ingest_feedback(state: dict, entries: list, kb_version: str) -> int:
+    """Add ratings to the running totals; returns how many couldn't be attributed."""
+    unattributed = 0
+    for entry in entries:
+        rating = entry.get("rating")
+        if not isinstance(rating, int) or not 1 <= rating <= 5:
+            continue
+        served = _served(entry, kb_version)
+        state["rated"] += 1
+        if not served:
+            unattributed += 1
+            continue
+        source, kb_point_id = served.get("source"), served.get("kb_point_id")
+        claimed = entry.get("kb_point_id")
+        if claimed is not None and str(claimed) != str(kb_point_id):
+            # The client rated some other answer than the one we have cached.
+            unattributed += 1
+            continue
+        if source == "knowledge_base" and kb_point_id:
+            state["kb_rated"] += 1
+            stats = state["kb"].setdefault(str(kb_point_id), {"n": 0, "sum": 0})
+            stats["n"] += 1
+            stats["sum"] += rating
+        elif source in PROMOTABLE_SOURCES:
+            stats = state["candidates"].setdefault(_candidate_key(entry["question"], served), {
+                "n": 0, "sum": 0, "question": entry["question"], "answer": served.get("answer", ""),
+                "solution": served.get("solution", ""), "steps": served.get("steps", []),
+                "source": source, "served": True,
+            })
+            stats["n"] += 1
+            stats["sum"] += rating
+        else:
+            unattributed += 1
+    return unattributed
+
+
+def plan(state: dict) -> dict:
+    """KB points to quarantine or demote and answers to promote, from the running totals."""
+    quarantine, demote, promote = [], [], []
+    for point_id, stats in state["kb"].items():
+        if stats["n"] < MIN_VOTES or point_id in state["quarantined"]:
+            continue
+        mean = stats["sum"] / stats["n"]
+        if mean <= QUARANTINE_MEAN:
+            quarantine.append(point_id)
+        elif mean <= DEMOTE_MEAN and point_id not in state["demoted"]:
+            demote.append(point_id)
+    for key, stats in state["candidates"].items():
+        # Candidates recorded before answers were taken from the cache carry client text.
+        if key in state["promoted"] or not stats.get("served") or stats["n"] < PROMOTE_MIN_VOTES:
+            continue
+        if stats["sum"] / stats["n"] >= PROMOTE_MEAN:
+            promote.append(key)
+    return {"quarantine": quarantine, "demote": demote, "promote": promote}
+
+
+def _point_id(point_id: str):
+    return int(point_id) if point_id.isdigit() else point_id
+
+
+def _promoted_point(key: str, stats: dict):
+    embedding = generate_embedding(stats["question"])
+    if not embedding:
+        return None
+    payload = {
+        "question": stats["question"],
+        "answer": stats["answer"],
+        "solution": stats["solution"],
+        "steps": stats["steps"],
+        "source": f"promoted_{stats['source']}",
+        "topics": ["promoted"],
+        "confidence": round(stats["sum"] / stats["n"] / 5, 2),
+    }
+    return PointStruct(id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"promoted:{key}")), vector=embedding, payload=payload)
+
+
+def apply(actions: dict, state: dict, collection: str, client: QdrantClient) -> dict:
+    """Write the planned changes to Qdrant (and the doc store); returns what was applied."""
+    applied = {"quarantine": [], "demote": [], "promote": []}
+    for point_id in actions["quarantine"]:
+        client.set_payload(collection, payload={"quarantined": True}, points=[_point_id(point_id)])
+        state["quarantined"].append(point_id)
+        applied["quarantine"].append(point_id)
+    for point_id in actions["demote"]:
+        client.set_payload(collection, payload={"penalty": DEMOTE_PENALTY}, points=[_point_id(point_id)])
+        state["demoted"].append(point_id)
+        applied["demote"].append(point_id)
+
+    points, keys = [], []
+    for key in actions["promote"]:
+        point = _promoted_point(key, state["candidates"][key])
+        if point is None:
+            logger.warning(f"⚠️ No embedding, not promoting: {key[:60]}")
+            continue
+        points.append(point)
+        keys.append(key)
+    if points:
+        ensure_payload_indexes(client, collection)
+        store_documents(collection, points)
+        client.upsert(collection_name=collection, points=points)
+        state["promoted"].extend(keys)
+        applied["promote"] = keys
+    return applied
+
+
+def estimate_hit_rate(state: dict, actions: dict) -> dict:
+    """
+    KB share of rated answers now, and after the actions, assuming each
+    question keeps its share of traffic: quarantined points stop answering,
+    promoted questions start being answered by the KB.
+    """
+    rated = state["rated"]
+    if not rated:
+        return {"rated": 0, "kb_hit_rate": 0.0, "expected_kb_hit_rate": 0.0}
+    lost = sum(state["kb"][p]["n"] for p in actions["quarantine"])
+    gained = sum(state["candidates"][k]["n"] for k in actions["promote"])
+    before = state["kb_rated"] / rated
+    after = (state["kb_rated"] - lost + gained) / rated
+    return {"rated": rated, "kb_hit_rate": round(before, 4), "expected_kb_hit_rate": round(after, 4),
+            "expected_change": round(after - before, 4)}
+
+
+def run_curation(collection: str = "math_kb", dry_run: bool = False, client: QdrantClient = None) -> dict:
+    state = load_state()
+    offset = state["offset"]
+    if os.path.exists(FEEDBACK_LOG) and os.path.getsize(FEEDBACK_LOG) < offset:
+        logger.warning("⚠️ Feedback log shrank (rotated?); reading it from the start")
+        offset = 0
+    entries, offset = read_feedback(offset)
+    unattributed = ingest_feedback(state, entries, get_kb_version(collection))
+
+    actions = plan(state)
+    report = {
+        "new_feedback": len(entries),
+        "unattributed": unattributed,
+        "planned": {name: len(ids) for name, ids in actions.items()},
+        "estimate": estimate_hit_rate(state, actions),
+    }
+    if dry_run:
+        report["applied"] = None
+        return report
+
+    applied = apply(actions, state, collection, client or QdrantClient(url=QDRANT_URL))
+    if any(applied.values()):
+        bump_kb_version(collection)
+    state["offset"] = offset
+    save_state(state)
+    report["applied"] = {name: len(ids) for name, ids in applied.items()}
+    logger.info(f"✅ KB curation: {report}")
+    return report
@@ -0,0 +1,61 @@
+"""
+Per-request deadlines.
+
+main.py creates a Deadline for every request (REQUEST_DEADLINE seconds by
+default, or the client's own `timeout`, capped at REQUEST_DEADLINE_MAX) and
+passes it through route_question into every stage. Stages skip themselves
+when less than their minimum budget remains, and derive their own timeouts
+(HTTP calls, SymPy budgets) from `remaining()`. When the client-facing wait
+expires, main.py calls `cancel()` so no further stage starts for a request
+nobody is waiting on.
+"""
+import os
+import threading
+import time
+
+DEFAULT_BUDGET = float(os.getenv("REQUEST_DEADLINE", 20.0))
+MAX_BUDGET = float(os.getenv("REQUEST_DEADLINE_MAX", 60.0))
+
+
+class Deadline:
+    def __init__(self, budget: float = None):
+        if budget is None or budget <= 0:
+            budget = DEFAULT_BUDGET
+        self.budget = min(budget, MAX_BUDGET)
+        self.expires_at = time.monotonic() + self.budget
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def until(cls, expires_at: float) -> "Deadline":
+        """A fresh deadline expiring at the same moment as another (time.monotonic)."""
+        deadline = cls()
+        deadline.expires_at = expires_at
+        return deadline
+
+    def extend(self, expires_at: float):
+        """Move the expiry out to `expires_at`; never earlier."""
+        self.expires_at = max(self.expires_at, expires_at)
+
+    def remaining(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def has(self, seconds: float) -> bool:
+        """True if at least `seconds` are left and the request wasn't cancelled."""
+        return self.remaining() > seconds
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for a blocking call: the smaller of `cap` and what's left."""
+        return min(cap, self.remaining())
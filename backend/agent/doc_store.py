@@ -0,0 +1,119 @@
+"""
+Local document store for KB entries, keyed by Qdrant point ID.
+
+Qdrant keeps only the vector and a few small, filterable payload fields
+(SLIM_FIELDS); the full entry (answer, solution, steps, ...) and its markdown,
+rendered once at ingestion, live here in SQLite. A search ships slim payloads
+for every hit and the router fetches the full document only for the winning
+one. Ingestion scripts call `store_documents` on their points right before
+upserting; scripts/migrate_doc_store.py moves an existing collection over.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from agent.kb_schema import normalize_payload
+from agent.markdown import render_markdown
+
+logger = logging.getLogger(__name__)
+
+STORE_PATH = os.getenv(
+    "KB_DOC_STORE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "kb_docs.sqlite3"),
+)
+
+# Payload fields kept in Qdrant: small, and useful for filtering, ranking or logging.
+SLIM_FIELDS = ("question", "topic", "topics", "difficulty", "source", "penalty", "quarantined")
+
+
+def slim_payload(entry: dict) -> dict:
+    return {k: entry[k] for k in SLIM_FIELDS if k in entry}
+
+
+class DocStore:
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Per thread and per process, as in agent/answer_cache.py.
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " collection TEXT NOT NULL,"
+            " point_id TEXT NOT NULL,"
+            " entry TEXT NOT NULL,"
+            " markdown TEXT NOT NULL,"
+            " PRIMARY KEY (collection, point_id))"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def put_many(self, collection: str, items):
+        """Store (point_id, entry) pairs, rendering each entry's markdown once."""
+        rows = [
+            (collection, str(point_id), json.dumps(entry, ensure_ascii=False),
+             render_markdown(entry.get("solution", ""), entry.get("steps", [])))
+            for point_id, entry in items
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO docs (collection, point_id, entry, markdown) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            # Leave the thread's connection usable for the next BEGIN.
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def get(self, collection: str, point_id) -> Optional[dict]:
+        """The full entry plus its "markdown", or None if the point isn't stored."""
+        try:
+            row = self._conn().execute(
+                "SELECT entry, markdown FROM docs WHERE collection = ? AND point_id = ?",
+                (collection, str(point_id)),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Doc store read failed: {e}")
+            return None
+        if not row:
+            return None
+        entry = json.loads(row[0])
+        entry["markdown"] = row[1]
+        return entry
+
+    def delete(self, collection: str, point_ids):
+        self._conn().executemany(
+            "DELETE FROM docs WHERE collection = ? AND point_id = ?",
+            [(collection, str(p)) for p in point_ids],
+        )
+
+
+doc_store = DocStore()
+
+
+def store_documents(collection: str, points: list, source: str = None) -> list:
+    """
+    Normalize each PointStruct's payload (agent/kb_schema.py; `source` fills in
+    a missing one), write it to the doc store and replace it with the slim
+    payload, in place. Returns `points` for chaining.
+    """
+    for p in points:
+        p.payload = normalize_payload(p.payload, source)
+    doc_store.put_many(collection, [(p.id, p.payload) for p in points])
+    for p in points:
+        p.payload = slim_payload(p.payload)
+    return points
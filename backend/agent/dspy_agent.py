@@ -1,5 +1,6 @@
 import dspy
 from agent.knowledge_base import search_knowledge_base
+from agent.markdown import render_markdown
 
 class MathFeedbackAgent(dspy.Module):
     def __init__(self):
@@ -7,23 +8,14 @@ class MathFeedbackAgent(dspy.Module):
         self.prompt_template = dspy.Predict("question -> answer, steps, solution")
 
     def format_markdown(self, answer, steps, solution):
-        return f"""## ✅ Final Answer
-\
-
-\[
-{solution}
-\\]
-
-
-
-## 🧠 Step-by-Step Breakdown
-""" + "\n".join([f"### Step {i+1}\n{step}" for i, step in enumerate(steps)])
+        return render_markdown(solution, steps)
 
     def forward(self, question):
         # First try KB
         kb_result = search_knowledge_base(question)
         if kb_result:
-            markdown = self.format_markdown(kb_result["answer"], kb_result["steps"], kb_result["solution"])
+            markdown = kb_result.get("markdown") or self.format_markdown(
+                kb_result["answer"], kb_result["steps"], kb_result["solution"])
             print("✅ KB hit:", kb_result["answer"])
             return dspy.Prediction(
                 answer=kb_result["answer"],
@@ -0,0 +1,102 @@
+"""
+Fast paths for the bulk of our equation traffic: polynomials in one unknown
+and small linear systems with rational coefficients.
+
+Degree 1 and 2 use the closed forms directly in exact arithmetic. Higher
+degrees and linear systems are solved numerically with NumPy, the float
+results are recovered as rationals, and every recovered value is checked by
+exact substitution. Anything that can't be confirmed exactly returns None so
+the caller falls back to `sympy.solve` - the fast path never trades exactness
+for speed.
+"""
+from fractions import Fraction
+from typing import Optional
+
+import numpy as np
+from sympy import I, Poly, Rational, linear_eq_to_matrix, sqrt
+from sympy.polys.polyerrors import PolynomialError
+from sympy.solvers.solveset import NonlinearError
+
+# Denominators above this are not trusted from a float recovery.
+MAX_DENOMINATOR = 10**6
+MAX_SYSTEM_SIZE = 10
+
+
+def _rational(value: float) -> Rational:
+    frac = Fraction(value).limit_denominator(MAX_DENOMINATOR)
+    return Rational(frac.numerator, frac.denominator)
+
+
+def _quadratic_roots(a, b, c) -> list:
+    disc = b**2 - 4 * a * c
+    if disc == 0:
+        return [-b / (2 * a)]
+    root = I * sqrt(-disc) if disc < 0 else sqrt(disc)
+    roots = [(-b - root) / (2 * a), (-b + root) / (2 * a)]
+    # Same order as sympy.solve: ascending, conjugate pairs by imaginary part.
+    key = (lambda r: r.as_real_imag()[1]) if disc < 0 else (lambda r: r)
+    return sorted(roots, key=key)
+
+
+def solve_polynomial(expr, var) -> Optional[list]:
+    """Distinct exact roots of expr = 0 in `var`, or None if not confirmable."""
+    try:
+        poly = Poly(expr, var)
+    except PolynomialError:
+        return None
+    coeffs = poly.all_coeffs()
+    if poly.degree() < 1 or not all(c.is_Rational for c in coeffs):
+        return None
+    if poly.degree() == 1:
+        return [-coeffs[1] / coeffs[0]]
+    if poly.degree() == 2:
+        return _quadratic_roots(*coeffs)
+
+    # Peel off every rational root found numerically, confirming each exactly.
+    roots = []
+    with np.errstate(all="ignore"):
+        estimates = np.roots([float(c) for c in coeffs])
+    for estimate in sorted(estimates, key=lambda r: (abs(r.imag), r.real)):
+        if abs(estimate.imag) > 1e-7 or poly.degree() <= 2:
+            continue
+        candidate = _rational(estimate.real)
+        while poly.degree() > 0 and poly.eval(candidate) == 0:
+            poly = poly.quo(Poly(var - candidate, var))
+            if candidate not in roots:
+                roots.append(candidate)
+    if poly.degree() > 2:
+        return None
+    rest = []
+    if poly.degree() == 1:
+        c1, c0 = poly.all_coeffs()
+        rest = [-c0 / c1]
+    elif poly.degree() == 2:
+        rest = _quadratic_roots(*poly.all_coeffs())
+    real = sorted({r for r in roots + rest if r.is_real})
+    return real + [r for r in rest if not r.is_real]
+
+
+def solve_linear_system(equations, symbols) -> Optional[dict]:
+    """Exact unique solution {symbol: value} of a square rational linear system, or None."""
+    if not equations or len(equations) != len(symbols) or len(symbols) > MAX_SYSTEM_SIZE:
+        return None
+    try:
+        A, b = linear_eq_to_matrix(equations, symbols)
+    except (NonlinearError, ValueError):
+        return None
+    if not all(v.is_Rational for v in list(A) + list(b)):
+        return None
+    a_float = np.array(A.tolist(), dtype=float)
+    b_float = np.array(b.tolist(), dtype=float).ravel()
+    try:
+        if np.linalg.cond(a_float) > 1e10:
+            return None
+        x = np.linalg.solve(a_float, b_float)
+    except np.linalg.LinAlgError:
+        return None
+    values = [_rational(v) for v in x]
+    # Exact check: A * values == b in rational arithmetic.
+    for row in range(A.rows):
+        if sum(A[row, col] * values[col] for col in range(A.cols)) != b[row]:
+            return None
+    return dict(zip(symbols, values))
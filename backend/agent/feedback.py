@@ -1,76 +1,108 @@
 """
 Feedback management module for storing and analyzing user feedback.
+
+Feedback is an append-only JSON-lines log (FEEDBACK_LOG_PATH): each entry is
+one line, written with a single append, so concurrent workers never rewrite
+each other's entries and consumers such as the KB curation job
+(agent/curation.py) can read it incrementally from a byte offset. Entries
+from the old feedback.json file are still counted in the stats.
 """
 import json
 import os
-from typing import List, Dict
+import threading
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+FEEDBACK_LOG = os.getenv(
+    "FEEDBACK_LOG_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "feedback.jsonl"),
+)
+LEGACY_FEEDBACK_FILE = os.path.join(os.path.dirname(__file__), "..", "feedback.json")
+
+_write_lock = threading.Lock()
 
-FEEDBACK_FILE = os.path.join(os.path.dirname(__file__), "..", "feedback.json")
 
-def store_feedback(question: str, answer: str, rating: int, comment: str = "") -> str:
+def store_feedback(question: str, answer: str, rating: int, comment: str = "",
+                   source: Optional[str] = None, kb_point_id: Optional[str] = None,
+                   solution: str = "", steps: Optional[List[str]] = None) -> str:
     """
-    Store user feedback in a JSON file.
-    Returns feedback ID.
+    Append user feedback to the log. `source` and `kb_point_id` identify what
+    produced the rated answer (as returned by /solve). Returns feedback ID.
     """
-    from datetime import datetime
-    
     feedback_entry = {
         "id": f"fb_{datetime.now().timestamp()}",
         "timestamp": datetime.now().isoformat(),
         "question": question,
         "answer": answer,
         "rating": rating,
-        "comment": comment
+        "comment": comment,
+        "source": source,
+        "kb_point_id": kb_point_id,
+        "solution": solution,
+        "steps": steps or [],
     }
-    
-    # Load existing feedback
+    line = json.dumps(feedback_entry, ensure_ascii=False) + "\n"
+
+    os.makedirs(os.path.dirname(FEEDBACK_LOG), exist_ok=True)
+    with _write_lock, open(FEEDBACK_LOG, "a", encoding="utf-8") as f:
+        f.write(line)
+
+    return feedback_entry["id"]
+
+
+def read_feedback(offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    Entries appended after byte `offset`, and the offset to resume from.
+    A partially written last line is left for the next read.
+    """
+    if not os.path.exists(FEEDBACK_LOG):
+        return [], offset
+    entries = []
+    with open(FEEDBACK_LOG, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            try:
+                entries.append(json.loads(raw))
+            except json.JSONDecodeError:
+                continue
+    return entries, offset
+
+
+def _load_all() -> List[Dict]:
     feedbacks = []
-    if os.path.exists(FEEDBACK_FILE):
+    if os.path.exists(LEGACY_FEEDBACK_FILE):
         try:
-            with open(FEEDBACK_FILE, 'r') as f:
+            with open(LEGACY_FEEDBACK_FILE, 'r') as f:
                 feedbacks = json.load(f)
-        except json.JSONDecodeError:
+        except (OSError, json.JSONDecodeError):
             feedbacks = []
-    
-    # Add new feedback
-    feedbacks.append(feedback_entry)
-    
-    # Save to file
-    os.makedirs(os.path.dirname(FEEDBACK_FILE), exist_ok=True)
-    with open(FEEDBACK_FILE, 'w') as f:
-        json.dump(feedbacks, f, indent=2)
-    
-    return feedback_entry["id"]
+    return feedbacks + read_feedback()[0]
+
 
 def get_feedback_stats() -> Dict:
     """
     Get statistics about collected feedback.
     """
-    if not os.path.exists(FEEDBACK_FILE):
-        return {
-            "total_feedback": 0,
-            "average_rating": 0.0,
-            "ratings_distribution": {}
-        }
-    
     try:
-        with open(FEEDBACK_FILE, 'r') as f:
-            feedbacks = json.load(f)
-        
+        feedbacks = _load_all()
+
         if not feedbacks:
             return {
                 "total_feedback": 0,
                 "average_rating": 0.0,
                 "ratings_distribution": {}
             }
-        
+
         # Calculate stats
         total = len(feedbacks)
         avg_rating = sum(f.get("rating", 0) for f in feedbacks) / total
         ratings_dist = {}
         for i in range(1, 6):
             ratings_dist[i] = sum(1 for f in feedbacks if f.get("rating") == i)
-        
+
         return {
             "total_feedback": total,
             "average_rating": round(avg_rating, 2),
@@ -84,18 +116,13 @@ def get_feedback_stats() -> Dict:
             "ratings_distribution": {}
         }
 
+
 def get_low_rated_feedback(min_rating: int = 2) -> List[Dict]:
     """
     Get feedback entries with low ratings for improvement.
     """
-    if not os.path.exists(FEEDBACK_FILE):
-        return []
-    
     try:
-        with open(FEEDBACK_FILE, 'r') as f:
-            feedbacks = json.load(f)
-        
-        return [f for f in feedbacks if f.get("rating", 5) <= min_rating]
+        return [f for f in _load_all() if f.get("rating", 5) <= min_rating]
     except Exception as e:
         print(f"Error loading feedback: {e}")
         return []
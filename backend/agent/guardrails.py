@@ -1,4 +1,5 @@
 import re
+from typing import Iterable, List
 from sympy import sympify, solve, diff, integrate, Symbol
 
 MATH_KEYWORDS = [
@@ -23,16 +24,37 @@ HALLUCINATION_MARKERS = [
     "I'm not capable", "I don't understand"
 ]
 
+# Each keyword/topic/marker set is compiled once into a single alternation so a
+# question is scanned in one pass instead of one regex (re)build per entry.
+_KEYWORD_RE = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in MATH_KEYWORDS) + r')\b')
+_BANNED_RE = re.compile('|'.join(re.escape(b) for b in BANNED_TOPICS))
+_SYMBOLS_RE = re.compile(r'[\d\+\-\*/=xyzπ√∑∫∞^()sintcostanlogexp]')
+_SIMPLE_EXPR_RE = re.compile(r'^[\dxyz\+\-\*/\^=\s\(\)]+$')
+_MARKER_RE = re.compile('|'.join(re.escape(m) for m in HALLUCINATION_MARKERS), re.IGNORECASE)
+_MARKER_RES = [re.compile(re.escape(m), re.IGNORECASE) for m in HALLUCINATION_MARKERS]
+_WHITESPACE_RE = re.compile(r'\s+')
+
 def validate_input(question: str) -> bool:
     if not question or len(question.strip()) < 2:
         return False
     q = question.lower()
-    if any(b in q for b in BANNED_TOPICS):
+    if _BANNED_RE.search(q):
         return False
-    has_keyword = any(re.search(rf'\b{re.escape(k)}\b', q) for k in MATH_KEYWORDS)
-    has_symbols = bool(re.search(r'[\d\+\-\*/=xyzπ√∑∫∞^()sintcostanlogexp]', q))
-    is_simple_expr = bool(re.match(r'^[\dxyz\+\-\*/\^=\s\(\)]+$', question.strip()))
-    return has_keyword or has_symbols or is_simple_expr
+    return bool(
+        _KEYWORD_RE.search(q)
+        or _SYMBOLS_RE.search(q)
+        or _SIMPLE_EXPR_RE.match(question.strip())
+    )
+
+def validate_batch(questions: Iterable[str]) -> List[bool]:
+    """Validate many questions at once; same decisions as `validate_input`."""
+    seen = {}
+    results = []
+    for q in questions:
+        if q not in seen:
+            seen[q] = validate_input(q)
+        results.append(seen[q])
+    return results
 
 def rejection_message() -> str:
     return (
@@ -45,11 +67,18 @@ def sanitize_output(answer: str) -> str:
     if not answer:
         return ""
     sanitized = answer
-    for marker in HALLUCINATION_MARKERS:
-        sanitized = re.sub(re.escape(marker), '', sanitized, flags=re.IGNORECASE)
-    sanitized = re.sub(r'\s+', ' ', sanitized).strip()
+    # Markers are rare, so one combined scan decides whether the ordered
+    # per-marker removal (which defines the exact output) needs to run at all.
+    if _MARKER_RE.search(sanitized):
+        for marker_re in _MARKER_RES:
+            sanitized = marker_re.sub('', sanitized)
+    sanitized = _WHITESPACE_RE.sub(' ', sanitized).strip()
     return sanitized
 
+def sanitize_batch(answers: Iterable[str]) -> List[str]:
+    """Sanitize many answers at once; same output as `sanitize_output`."""
+    return [sanitize_output(a) for a in answers]
+
 def solver(question: str):
     if not validate_input(question):
         return rejection_message()
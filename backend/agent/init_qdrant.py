@@ -1,12 +1,15 @@
 from qdrant_client import QdrantClient
 from qdrant_client.models import VectorParams, Distance
 
+from agent.kb_schema import ensure_payload_indexes
+
 client = QdrantClient(url="http://localhost:6333")
 
 client.recreate_collection(
     collection_name="math_kb",
     vectors_config=VectorParams(size=2048, distance=Distance.COSINE)
 )
+ensure_payload_indexes(client, "math_kb")
 
 
 print("✅ Qdrant collection 'math_kb' created.")
@@ -0,0 +1,160 @@
+"""
+Tiered indefinite integration with a time budget.
+
+`sympy.integrate` can wander into the Risch and Meijer-G algorithms and take
+minutes on inputs a table would answer instantly, so integrals are tried in
+increasingly expensive tiers and stop at the first one that works:
+
+1. table      memoized standard forms (x^n, e^(ax+b), sin, cos, 1/(1+x^2), ...)
+              with linearity and linear substitution; microseconds.
+2. manual     `manualintegrate` (the step-by-step integrator), small budget.
+3. heuristic  `integrate(risch=False, meijerg=False)`, small budget.
+4. full       plain `integrate` with whatever is left of the total budget.
+
+The winning tier is logged and counted in metrics (integration.tier.*) so the
+budgets can be tuned from production traffic.
+"""
+import logging
+import os
+import time
+from functools import lru_cache
+
+from sympy import (
+    Add, Integral, S, asin, atan, cos, cosh, exp, integrate, log, sin, sinh, tan, sec,
+)
+from sympy.integrals.manualintegrate import manualintegrate
+
+from agent.metrics import metrics
+from agent.timebox import run_with_timeout
+
+logger = logging.getLogger(__name__)
+
+INTEGRATION_BUDGET = float(os.getenv("INTEGRATION_BUDGET", 4.0))
+MANUAL_BUDGET = float(os.getenv("INTEGRATION_MANUAL_BUDGET", 0.5))
+HEURISTIC_BUDGET = float(os.getenv("INTEGRATION_HEURISTIC_BUDGET", 1.0))
+
+TIERS = ("table", "manual", "heuristic", "full")
+
+
+def _slope(u, x):
+    """a if u = a*x + b (a != 0), else None."""
+    a = u.diff(x)
+    return None if a.has(x) or a == 0 else a
+
+
+def _base_form(f, x):
+    """Antiderivative of a single non-constant factor, or None."""
+    if f == x:
+        return x**2 / 2
+    if f.is_Pow:
+        base, e = f.args
+        # Symbolic exponents or bases have special cases (n = -1, a = 1) that
+        # only SymPy's Piecewise result covers.
+        if e.is_number:
+            a = _slope(base, x)
+            if a is not None:
+                return log(base) / a if e == -1 else base**(e + 1) / ((e + 1) * a)
+            if base == 1 + x**2 and e == -1:
+                return atan(x)
+            if base == 1 - x**2 and e == S(-1) / 2:
+                return asin(x)
+            if e == 2 and isinstance(base, sec) and _slope(base.args[0], x) is not None:
+                return tan(base.args[0]) / _slope(base.args[0], x)
+            if e == -2 and isinstance(base, cos) and _slope(base.args[0], x) is not None:
+                return tan(base.args[0]) / _slope(base.args[0], x)
+            return None
+        if base.is_number:
+            a = _slope(e, x)
+            return f / (a * log(base)) if a is not None else None
+        return None
+    if len(f.args) != 1:
+        return None
+    u = f.args[0]
+    a = _slope(u, x)
+    if a is None:
+        return None
+    if isinstance(f, exp):
+        return exp(u) / a
+    if isinstance(f, sin):
+        return -cos(u) / a
+    if isinstance(f, cos):
+        return sin(u) / a
+    if isinstance(f, tan):
+        return -log(cos(u)) / a
+    if isinstance(f, sinh):
+        return cosh(u) / a
+    if isinstance(f, cosh):
+        return sinh(u) / a
+    if isinstance(f, log):
+        return (u * log(u) - u) / a
+    return None
+
+
+@lru_cache(maxsize=1024)
+def table_integrate(f, x):
+    """Table lookup with linearity; None when the integrand isn't a standard form."""
+    if not f.has(x):
+        return f * x
+    if f.is_Add:
+        parts = [table_integrate(term, x) for term in f.args]
+        return None if any(p is None for p in parts) else Add(*parts)
+    coeff, rest = f.as_independent(x, as_Add=False)
+    if coeff != 1:
+        inner = table_integrate(rest, x)
+        return None if inner is None else coeff * inner
+    return _base_form(f, x)
+
+
+def _closed(result) -> bool:
+    return result is not None and not result.has(Integral)
+
+
+def _manual(f, x):
+    return manualintegrate(f, x)
+
+
+def _heuristic(f, x):
+    return integrate(f, x, risch=False, meijerg=False)
+
+
+def _full(f, x):
+    return integrate(f, x)
+
+
+def integrate_tiered(f, x, budget: float = None):
+    """
+    Return (antiderivative, tier). The antiderivative is None when every tier
+    failed or the budget ran out; tier is then "unsolved" or "budget".
+    """
+    budget = INTEGRATION_BUDGET if budget is None else budget
+    deadline = time.monotonic() + budget
+    start = time.perf_counter()
+
+    result, tier = table_integrate(f, x), "table"
+    if not _closed(result):
+        result, tier = None, "unsolved"
+        for name, fn, cap in (("manual", _manual, MANUAL_BUDGET),
+                              ("heuristic", _heuristic, HEURISTIC_BUDGET),
+                              ("full", _full, None)):
+            remaining = deadline - time.monotonic()
+            try:
+                candidate = run_with_timeout(fn, remaining if cap is None else min(cap, remaining), f, x)
+            except TimeoutError:
+                tier = "budget"
+                metrics.incr(f"integration.timeout.{name}")
+                continue
+            except Exception as e:
+                logger.debug(f"Integration tier {name} failed: {e}")
+                continue
+            if _closed(candidate):
+                result, tier = candidate, name
+                break
+
+    elapsed = time.perf_counter() - start
+    metrics.incr(f"integration.tier.{tier}")
+    metrics.observe(f"integration.seconds.{tier}", elapsed)
+    if result is None:
+        logger.warning(f"⚠️ Integration gave up ({tier}) after {elapsed * 1000:.1f} ms")
+    else:
+        logger.info(f"∫ Integration resolved by {tier} tier in {elapsed * 1000:.1f} ms")
+    return result, tier
@@ -0,0 +1,202 @@
+"""
+Qdrant access layer for the knowledge base.
+
+- Collection metadata (exists, point count, vector size) is cached per
+  collection and re-fetched only when KB_METADATA_TTL expires, the collection's
+  KB version changes (any ingestion script bumps it) or a search reports the
+  collection missing. A search no longer costs a `get_collections` round trip.
+- Calls go through `AsyncQdrantClient` with gRPC preferred (QDRANT_PREFER_GRPC)
+  and a tuned keep-alive pool. The router's code is synchronous (it runs in
+  the threadpool), so the client lives on one background event loop per
+  process and `*_sync` methods submit to it; async callers can await the
+  coroutine methods directly on that loop via `run`.
+- Searches request only the slim payload fields (agent/doc_store.py); the
+  router reads the full entry of the winning hit from the local doc store, or
+  via `retrieve` for points that haven't been migrated yet.
+
+The loop and client are created lazily and re-created after a fork, so the
+pre-fork server (server.py) never shares a gRPC channel between workers.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import httpx
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import QueryRequest, SearchParams
+
+from agent.doc_store import SLIM_FIELDS
+from agent.kb_version import get_kb_version
+
+logger = logging.getLogger(__name__)
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "1") == "1"
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", 5))
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", 32))
+METADATA_TTL = float(os.getenv("KB_METADATA_TTL", 300))
+
+# Payload fields shipped with every search hit.
+ROUTER_PAYLOAD_FIELDS = list(SLIM_FIELDS)
+
+
+class KBClient:
+    def __init__(self, url: str = QDRANT_URL, prefer_grpc: bool = QDRANT_PREFER_GRPC,
+                 location: str = None):
+        self.url = url
+        self.prefer_grpc = prefer_grpc
+        self.location = location
+        self._metadata = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+        self.round_trips = 0
+
+    # ----------------------------------------------------------- event loop
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="kb-client", daemon=True).start()
+            self._loop, self._client, self._pid = loop, None, os.getpid()
+            self._metadata.clear()
+
+    def run(self, coro, timeout: float = None):
+        """Run a coroutine on the client's loop and wait for its result."""
+        if self._pid != os.getpid():
+            self._start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def _get_client(self) -> AsyncQdrantClient:
+        if self._client is None:
+            if self.location:
+                self._client = AsyncQdrantClient(location=self.location)
+            else:
+                self._client = AsyncQdrantClient(
+                    url=self.url,
+                    prefer_grpc=self.prefer_grpc,
+                    grpc_port=QDRANT_GRPC_PORT,
+                    timeout=QDRANT_TIMEOUT,
+                    grpc_options={
+                        "grpc.keepalive_time_ms": 30000,
+                        "grpc.keepalive_permit_without_calls": 1,
+                    },
+                    limits=httpx.Limits(
+                        max_connections=QDRANT_POOL_SIZE,
+                        max_keepalive_connections=QDRANT_POOL_SIZE,
+                    ),
+                )
+        return self._client
+
+    # ------------------------------------------------------------- metadata
+    def _cached_info(self, name: str, version: str):
+        cached = self._metadata.get(name)
+        if cached and cached["version"] == version and time.monotonic() - cached["fetched"] < METADATA_TTL:
+            return cached["info"]
+        return None
+
+    async def collection_info(self, name: str):
+        """Cached {"exists", "points_count", "vector_size"} for a collection."""
+        version = get_kb_version(name)
+        info = self._cached_info(name, version)
+        if info is not None:
+            return info
+
+        client = await self._get_client()
+        self.round_trips += 1
+        info = {"exists": False, "points_count": 0, "vector_size": None}
+        if await client.collection_exists(name):
+            self.round_trips += 1
+            details = await client.get_collection(name)
+            vectors = details.config.params.vectors
+            info = {
+                "exists": True,
+                "points_count": details.points_count or 0,
+                "vector_size": getattr(vectors, "size", None),
+            }
+        self._metadata[name] = {"info": info, "version": version, "fetched": time.monotonic()}
+        return info
+
+    def invalidate(self, name: str = None):
+        if name is None:
+            self._metadata.clear()
+        else:
+            self._metadata.pop(name, None)
+
+    # --------------------------------------------------------------- search
+    async def search(self, name: str, vector, limit: int = 3, score_threshold: float = None,
+                     payload_fields=ROUTER_PAYLOAD_FIELDS, hnsw_ef: int = 128, query_filter=None,
+                     timeout: int = None) -> list:
+        """Top `limit` hits with only `payload_fields` in their payloads."""
+        client = await self._get_client()
+        self.round_trips += 1
+        try:
+            response = await client.query_points(
+                collection_name=name,
+                query=vector,
+                limit=limit,
+                score_threshold=score_threshold,
+                with_payload=payload_fields,
+                search_params=SearchParams(hnsw_ef=hnsw_ef),
+                query_filter=query_filter,
+                timeout=timeout,
+            )
+        except Exception as e:
+            if "not found" in str(e).lower():
+                self.invalidate(name)
+            raise
+        return response.points
+
+    async def search_batch(self, name: str, vectors: list, limit: int = 3, score_threshold: float = None,
+                           payload_fields=ROUTER_PAYLOAD_FIELDS, hnsw_ef: int = 128, query_filter=None,
+                           timeout: int = None) -> list:
+        """One round trip for many searches; a list of hit lists, in `vectors` order."""
+        client = await self._get_client()
+        self.round_trips += 1
+        requests = [
+            QueryRequest(query=vector, limit=limit, score_threshold=score_threshold, with_payload=payload_fields,
+                         params=SearchParams(hnsw_ef=hnsw_ef), filter=query_filter)
+            for vector in vectors
+        ]
+        responses = await client.query_batch_points(collection_name=name, requests=requests, timeout=timeout)
+        return [response.points for response in responses]
+
+    async def retrieve(self, name: str, point_id, timeout: int = None):
+        """Full payload of one point, or None if it doesn't exist."""
+        client = await self._get_client()
+        self.round_trips += 1
+        points = await client.retrieve(name, ids=[point_id], with_payload=True, timeout=timeout)
+        return points[0].payload if points else None
+
+    # ------------------------------------------------------- sync facade
+    def collection_info_sync(self, name: str, timeout: float = None):
+        # Fresh cache hits are answered without a hop to the event loop.
+        info = self._cached_info(name, get_kb_version(name)) if self._pid == os.getpid() else None
+        if info is not None:
+            return info
+        return self.run(self.collection_info(name), timeout or QDRANT_TIMEOUT)
+
+    def search_sync(self, name: str, vector, timeout: int = None, **kwargs) -> list:
+        timeout = timeout or QDRANT_TIMEOUT
+        return self.run(self.search(name, vector, timeout=timeout, **kwargs), timeout + 1)
+
+    def search_batch_sync(self, name: str, vectors: list, timeout: int = None, **kwargs) -> list:
+        timeout = timeout or QDRANT_TIMEOUT
+        return self.run(self.search_batch(name, vectors, timeout=timeout, **kwargs), timeout + 1)
+
+    def retrieve_sync(self, name: str, point_id, timeout: int = None):
+        timeout = timeout or QDRANT_TIMEOUT
+        return self.run(self.retrieve(name, point_id, timeout=timeout), timeout + 1)
+
+
+kb_client = KBClient()
@@ -0,0 +1,99 @@
+"""
+KB payload schema: one shape for every ingestion script, keyword payload
+indexes on the filterable fields, and search filters built from them.
+
+Normalized payloads always carry
+- "topics": lower-case list (a lone "topic" is folded in),
+- "topic": display topic (the entry's own, else the first of "topics"),
+- "difficulty": lower-case, "unknown" when missing,
+- "source": slug such as "gsm8k", "physicswallahai", "jee_gold", "custom".
+Filter values go through the same normalization, so "PhysicsWallahAI" and
+"physicswallahai" select the same points.
+
+Feedback curation (agent/curation.py) may add "quarantined": true, which
+every search filter excludes, or a score "penalty" for demoted entries.
+"""
+import re
+
+from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchValue, PayloadSchemaType
+
+# Payload fields with a keyword index; also the filters search accepts.
+INDEXED_FIELDS = {
+    "topics": PayloadSchemaType.KEYWORD,
+    "difficulty": PayloadSchemaType.KEYWORD,
+    "source": PayloadSchemaType.KEYWORD,
+    "quarantined": PayloadSchemaType.BOOL,
+}
+
+_QUARANTINED = FieldCondition(key="quarantined", match=MatchValue(value=True))
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_source(source: str) -> str:
+    return _SLUG_RE.sub("_", str(source).lower()).strip("_") or "unknown"
+
+
+def normalize_topics(entry: dict) -> list:
+    topics = entry.get("topics") or []
+    if isinstance(topics, str):
+        topics = topics.split(",")
+    if entry.get("topic"):
+        topics = [entry["topic"], *topics]
+    normalized = []
+    for topic in topics:
+        topic = str(topic).strip().lower()
+        if topic and topic not in normalized:
+            normalized.append(topic)
+    return normalized or ["general"]
+
+
+def normalize_payload(entry: dict, source: str = None) -> dict:
+    """A copy of `entry` with topics/topic/difficulty/source in the common shape."""
+    entry = dict(entry)
+    topics = normalize_topics(entry)
+    entry["topics"] = topics
+    entry["topic"] = entry.get("topic") or topics[0].title()
+    entry["difficulty"] = str(entry.get("difficulty") or "unknown").strip().lower()
+    entry["source"] = normalize_source(entry.get("source") or source or "unknown")
+    return entry
+
+
+def ensure_payload_indexes(client, collection: str):
+    """Create the keyword indexes on a (sync) QdrantClient's collection."""
+    for field, schema in INDEXED_FIELDS.items():
+        client.create_payload_index(collection_name=collection, field_name=field, field_schema=schema)
+
+
+def as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def build_filter(topics=None, difficulty=None, sources=None):
+    """Qdrant filter matching any of the given values per field, never quarantined points."""
+    conditions = []
+    for field, values in (
+        ("topics", [v.lower() for v in as_list(topics)]),
+        ("difficulty", [v.lower() for v in as_list(difficulty)]),
+        ("source", [normalize_source(v) for v in as_list(sources)]),
+    ):
+        if values:
+            conditions.append(FieldCondition(key=field, match=MatchAny(any=values)))
+    return Filter(must=conditions or None, must_not=[_QUARANTINED])
+
+
+def filter_key(filters: dict) -> str:
+    """Stable string for a filters dict, to key caches; "" when unfiltered."""
+    if not filters:
+        return ""
+    parts = []
+    for name in ("topics", "difficulty", "sources", "source_priority"):
+        values = as_list(filters.get(name))
+        if values:
+            values = [normalize_source(v) if "source" in name else v.lower() for v in values]
+            parts.append(f"{name}={','.join(values if name == 'source_priority' else sorted(values))}")
+    return ";".join(parts)
@@ -0,0 +1,51 @@
+"""
+Knowledge base version marker.
+
+Every script that (re)writes a Qdrant collection calls `bump_kb_version`, and
+caches that store KB-derived answers key their entries on `get_kb_version`,
+so a rebuild invalidates them without any coordination between processes.
+"""
+import json
+import os
+import time
+import uuid
+
+VERSION_FILE = os.getenv(
+    "KB_VERSION_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "data", "kb_version.json"),
+)
+
+_cache = {"mtime": None, "versions": {}}
+
+
+def _load() -> dict:
+    try:
+        mtime = os.stat(VERSION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if mtime != _cache["mtime"]:
+        try:
+            with open(VERSION_FILE, "r") as f:
+                _cache["versions"] = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            _cache["versions"] = {}
+        _cache["mtime"] = mtime
+    return _cache["versions"]
+
+
+def get_kb_version(collection_name: str = "math_kb") -> str:
+    """Current version of a collection ("0" if it was never bumped)."""
+    return _load().get(collection_name, "0")
+
+
+def bump_kb_version(collection_name: str = "math_kb") -> str:
+    """Record that a collection changed; returns the new version."""
+    versions = dict(_load())
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    versions[collection_name] = version
+    os.makedirs(os.path.dirname(VERSION_FILE), exist_ok=True)
+    tmp = f"{VERSION_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(versions, f, indent=2)
+    os.replace(tmp, VERSION_FILE)
+    return version
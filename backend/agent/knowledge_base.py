@@ -1,17 +1,42 @@
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 import requests
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
-from qdrant_client.models import SearchParams, Distance, VectorParams
 from sentence_transformers import SentenceTransformer
 
+from agent.admission import limit, Overloaded
+from agent.circuit_breaker import breakers, CircuitOpen
+from agent.metrics import metrics
+from agent.kb_client import kb_client
+from agent.doc_store import doc_store
+from agent.markdown import render_markdown
+from agent.kb_schema import build_filter, normalize_source, as_list, filter_key
+from agent.negative_cache import kb_misses
+
 load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# With source priorities, hits within this score of the best one compete on source.
+SOURCE_PRIORITY_MARGIN = float(os.getenv("KB_SOURCE_PRIORITY_MARGIN", 0.05))
+
+# Recent embeddings, so a question embedded for the semantic cache
+# (agent/semantic_cache.py) or a batch (prefetch_knowledge_base) isn't
+# embedded again by the KB stage.
+EMBEDDING_MEMO_SIZE = int(os.getenv("EMBEDDING_MEMO_SIZE", 1024))
+_embedding_memo = OrderedDict()
+_embedding_memo_lock = threading.Lock()
+
+# Hits fetched ahead by prefetch_knowledge_base, consumed by search_knowledge_base.
+PREFETCH_TTL = 120.0
+_prefetched = OrderedDict()
+_prefetched_lock = threading.Lock()
+
 # Initialize embedding model
 try:
     model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -20,67 +45,218 @@ except Exception as e:
     logger.error(f"❌ Failed to load Sentence Transformer: {e}")
     model = None
 
-# Initialize Qdrant client
-try:
-    client = QdrantClient(url=os.getenv("QDRANT_URL", "http://localhost:6333"))
-    logger.info("✅ Qdrant client initialized")
-except Exception as e:
-    logger.error(f"❌ Failed to initialize Qdrant client: {e}")
-    client = None
-
 def check_collection_exists(collection_name: str = "math_kb") -> bool:
-    """Check if the collection exists in Qdrant"""
-    if not client:
-        return False
+    """Check if the collection exists in Qdrant (cached metadata, see agent/kb_client.py)"""
     try:
-        collections = client.get_collections()
-        return any(col.name == collection_name for col in collections.collections)
+        info = breakers["qdrant"].call(kb_client.collection_info_sync, collection_name)
+        return info["exists"]
+    except CircuitOpen:
+        return False
     except Exception as e:
         logger.error(f"❌ Error checking collections: {e}")
         return False
 
-def generate_embedding(text: str) -> list:
-    """Generate embedding using Sentence Transformer or Ollama fallback"""
+def generate_embedding(text: str, timeout: float = 30) -> list:
+    """
+    Generate embedding using Sentence Transformer or Ollama fallback.
+    Returns [] when no embedding is available (never a dummy vector).
+    """
+    embedding = _memo_get(text)
+    if embedding:
+        return embedding
+    with limit("embedding"):
+        try:
+            if model:
+                embedding = model.encode(text).tolist()
+            else:
+                response = breakers["ollama"].call(
+                    requests.post,
+                    "http://localhost:11434/api/embeddings",
+                    json={"model": "gemma:2b", "prompt": text},
+                    timeout=timeout
+                )
+                embedding = response.json().get("embedding", [])
+        except CircuitOpen:
+            return []
+        except Exception as e:
+            logger.error(f"❌ Embedding generation failed: {e}")
+            return []
+    if embedding:
+        _memo_put(text, embedding)
+    return embedding
+
+
+def generate_embeddings(texts: list, timeout: float = 30) -> list:
+    """
+    Embeddings for many texts, encoded in one batch by the local model
+    (one call per text with the Ollama fallback). Items that can't be
+    embedded are [].
+    """
+    missing = [t for t in dict.fromkeys(texts) if not _memo_get(t)]
+    if missing and model:
+        with limit("embedding"):
+            try:
+                for text, vector in zip(missing, model.encode(missing, batch_size=64).tolist()):
+                    _memo_put(text, vector)
+            except Exception as e:
+                logger.error(f"❌ Batch embedding failed: {e}")
+    elif missing:
+        for text in missing:
+            generate_embedding(text, timeout=timeout)
+    return [_memo_get(t) or [] for t in texts]
+
+
+def _memo_get(text: str):
+    with _embedding_memo_lock:
+        embedding = _embedding_memo.get(text)
+        if embedding:
+            _embedding_memo.move_to_end(text)
+        return embedding
+
+
+def _memo_put(text: str, embedding: list):
+    with _embedding_memo_lock:
+        _embedding_memo[text] = embedding
+        _embedding_memo.move_to_end(text)
+        if len(_embedding_memo) > EMBEDDING_MEMO_SIZE:
+            _embedding_memo.popitem(last=False)
+
+
+def _prefetch_key(collection_name: str, question: str, min_score: float, filters: dict):
+    return collection_name, min_score, filter_key(filters), question
+
+
+def _take_prefetched(key):
+    with _prefetched_lock:
+        entry = _prefetched.pop(key, None)
+    if entry and time.monotonic() - entry[0] < PREFETCH_TTL:
+        metrics.incr("kb.prefetch_used")
+        return entry[1]
+    return None
+
+
+def prefetch_knowledge_base(questions: list, collection_name: str = "math_kb", min_score: float = 0.75,
+                            filters: dict = None, deadline=None) -> int:
+    """
+    Embed `questions` in one batch and search them in one Qdrant round trip;
+    search_knowledge_base then uses these hits instead of searching again.
+    Best effort: returns how many questions were prefetched (0 on any failure).
+    """
+    questions = [q for q in dict.fromkeys(questions)
+                 if not (kb_misses and kb_misses.known_miss(collection_name, q, min_score, filters))]
+    if not questions or not breakers["qdrant"].available() or not check_collection_exists(collection_name):
+        return 0
+    filters = filters or {}
     try:
-        if model:
-            return model.encode(text).tolist()
-        else:
-            response = requests.post(
-                "http://localhost:11434/api/embeddings",
-                json={"model": "gemma:2b", "prompt": text},
-                timeout=30
+        embeddings = generate_embeddings(questions, timeout=deadline.timeout(30) if deadline else 30)
+        batch = [(q, e) for q, e in zip(questions, embeddings) if e]
+        if not batch:
+            return 0
+        with limit("qdrant"):
+            results = breakers["qdrant"].call(
+                kb_client.search_batch_sync,
+                collection_name,
+                [e for _, e in batch],
+                limit=5 if filters.get("source_priority") else 3,
+                score_threshold=min_score,
+                query_filter=build_filter(filters.get("topics"), filters.get("difficulty"), filters.get("sources")),
+                timeout=max(1, int(deadline.remaining())) if deadline else None
             )
-            return response.json().get("embedding", [])
+    except Overloaded:
+        raise
     except Exception as e:
-        logger.error(f"❌ Embedding generation failed: {e}")
-        return [0.0] * 384  # Dummy fallback
+        logger.warning(f"⚠️ KB prefetch failed, questions will be searched one by one: {e}")
+        return 0
+
+    now = time.monotonic()
+    with _prefetched_lock:
+        for (question, _), hits in zip(batch, results):
+            _prefetched[_prefetch_key(collection_name, question, min_score, filters)] = (now, hits)
+        while _prefetched and now - next(iter(_prefetched.values()))[0] >= PREFETCH_TTL:
+            _prefetched.popitem(last=False)
+    metrics.incr("kb.prefetched", len(batch))
+    return len(batch)
 
-def search_knowledge_base(question: str, collection_name: str = "math_kb", min_score: float = 0.75) -> dict:
+def _score(hit) -> float:
+    """Similarity minus the penalty feedback curation gave a demoted entry."""
+    return hit.score - float((hit.payload or {}).get("penalty", 0.0))
+
+
+def _pick_hit(hits: list, source_priority: list):
+    """Best hit, preferring earlier `source_priority` sources among near-ties."""
+    hits = sorted(hits, key=_score, reverse=True)
+    if not source_priority:
+        return hits[0]
+    rank = {source: i for i, source in enumerate(source_priority)}
+    floor = _score(hits[0]) - SOURCE_PRIORITY_MARGIN
+    contenders = [h for h in hits if _score(h) >= floor]
+    return min(contenders, key=lambda h: rank.get((h.payload or {}).get("source"), len(rank)))
+
+
+def search_knowledge_base(question: str, collection_name: str = "math_kb", min_score: float = 0.75,
+                          deadline=None, filters: dict = None) -> dict:
     """
     Search the knowledge base for relevant math content.
     Returns dict with answer, steps, solution, confidence or None if not found.
+    Network timeouts are capped by the request `deadline` when one is given.
+    `filters` may restrict "topics", "difficulty" and "sources" (indexed
+    payload fields, see agent/kb_schema.py) and rank near-tied hits by
+    "source_priority". Questions known to have no hit above `min_score`
+    (agent/negative_cache.py) are answered None without searching.
     """
-    if not check_collection_exists(collection_name):
-        logger.warning(f"⚠️ Collection '{collection_name}' does not exist. Skipping KB search.")
+    filters = filters or {}
+    query_filter = build_filter(filters.get("topics"), filters.get("difficulty"), filters.get("sources"))
+    source_priority = [normalize_source(s) for s in as_list(filters.get("source_priority"))]
+    if kb_misses and kb_misses.known_miss(collection_name, question, min_score, filters):
+        logger.info(f"🚫 Known KB miss, skipping search: {question[:50]}...")
         return None
 
+    hits = _take_prefetched(_prefetch_key(collection_name, question, min_score, filters))
+    if hits is None:
+        if not breakers["qdrant"].available():
+            metrics.incr("degraded.kb_skipped")
+            return None
+
+        if not check_collection_exists(collection_name):
+            logger.warning(f"⚠️ Collection '{collection_name}' does not exist. Skipping KB search.")
+            return None
+
     try:
-        embedding = generate_embedding(question)
+        if hits is None:
+            embedding = generate_embedding(question, timeout=deadline.timeout(30) if deadline else 30)
+            if not embedding:
+                metrics.incr("degraded.kb_skipped")
+                logger.warning("⚠️ No embedding available. Skipping KB search.")
+                return None
 
-        hits = client.search(
-            collection_name=collection_name,
-            query_vector=embedding,
-            limit=3,
-            score_threshold=min_score,
-            search_params=SearchParams(hnsw_ef=128)
-        )
+            with limit("qdrant"):
+                hits = breakers["qdrant"].call(
+                    kb_client.search_sync,
+                    collection_name,
+                    embedding,
+                    limit=5 if source_priority else 3,
+                    score_threshold=min_score,
+                    query_filter=query_filter,
+                    timeout=max(1, int(deadline.remaining())) if deadline else None
+                )
 
         if not hits:
             logger.info(f"📭 No KB results for: {question[:50]}...")
+            if kb_misses:
+                kb_misses.add(collection_name, question, min_score, filters)
             return None
 
-        top_hit = hits[0]
-        payload = top_hit.payload
+        top_hit = _pick_hit(hits, source_priority)
+        payload = doc_store.get(collection_name, top_hit.id)
+        if payload is None:
+            # Point not migrated to the doc store yet: fetch its full payload.
+            metrics.incr("kb.doc_store_miss")
+            payload = breakers["qdrant"].call(
+                kb_client.retrieve_sync,
+                collection_name,
+                top_hit.id,
+                timeout=max(1, int(deadline.remaining())) if deadline else None
+            ) or top_hit.payload
 
         # Debug: show matched KB question
         logger.info(f"🎯 Matched KB question: {payload.get('question', '')}")
@@ -93,15 +269,22 @@ def search_knowledge_base(question: str, collection_name: str = "math_kb", min_s
             "answer": payload.get("answer", ""),
             "steps": steps,
             "solution": payload.get("solution", ""),
-            "confidence": float(top_hit.score),
+            "confidence": _score(top_hit),
+            "point_id": str(top_hit.id),
             "topic": payload.get("topic", "General"),
             "difficulty": payload.get("difficulty", "Unknown"),
-            "source": payload.get("source", "Unknown")
+            "source": payload.get("source", "Unknown"),
+            "markdown": payload.get("markdown") or render_markdown(payload.get("solution", ""), steps)
         }
 
         logger.info(f"✅ KB hit: {payload.get('question', '')} | Score: {result['confidence']:.2f}")
         return result
 
+    except Overloaded:
+        raise
+    except CircuitOpen:
+        metrics.incr("degraded.kb_skipped")
+        return None
     except Exception as e:
         logger.error(f"❌ Qdrant search failed: {e}")
         return None
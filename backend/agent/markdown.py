@@ -0,0 +1,21 @@
+"""
+The one markdown renderer for KB entries.
+
+Markdown is rendered once, when an entry is written to the document store
+(agent/doc_store.py), instead of on every read by the DSPy agent and the
+maintenance scripts.
+"""
+import json
+
+
+def render_markdown(solution: str, steps: list) -> str:
+    """Final answer as a display-math block, then one heading per step."""
+    if isinstance(steps, str):
+        steps = [s.strip() for s in steps.split("\n") if s.strip()]
+    header = f"## ✅ Final Answer\n\n\\[\n{solution}\n\\]\n\n\n\n## 🧠 Step-by-Step Breakdown\n"
+    return header + "\n".join(f"### Step {i + 1}\n{step}" for i, step in enumerate(steps))
+
+
+def escape_markdown(text: str) -> str:
+    """Escape backslashes and newlines, as kb.json stores its markdown."""
+    return json.dumps(text)[1:-1]
@@ -1,12 +1,15 @@
 import logging, re
-from sympy import symbols, Eq, solve, integrate, diff, simplify, sympify, latex
-from sympy.parsing.sympy_parser import parse_expr
+from sympy import Eq, solve, diff, simplify
+
+from agent.fast_solve import solve_polynomial, solve_linear_system
+from agent.integration import integrate_tiered, INTEGRATION_BUDGET
+from agent.sympy_cache import cached_parse, cached_sympify, to_latex, symbol_table
 
 logger = logging.getLogger(__name__)
 
 class MathSolver:
     def __init__(self):
-        self.x, self.y, self.z = symbols("x y z")
+        self.x, self.y, self.z = symbol_table.get_many("xyz")
 
     def normalize_equation(self, expr: str) -> str:
         expr = expr.replace("^", "**")
@@ -20,7 +23,8 @@ class MathSolver:
         expr = re.sub(r'([a-zA-Z])(\d)', r'\1*\2', expr)
         return expr
 
-    def solve_equation(self, question: str) -> dict:
+    def solve_equation(self, question: str, budget: float = None) -> dict:
+        """Solve/integrate/differentiate `question`; `budget` caps integration time (seconds)."""
         try:
             q = self.normalize_equation(question)
             q = q.replace("?", "").strip()
@@ -40,10 +44,23 @@ class MathSolver:
             # ✅ Handle integration
             if re.search(r"(?i)integrate|∫", q):
                 expr = re.sub(r"(?i)integrate|∫", "", q).strip()
-                sym_expr = sympify(expr)
-                result = integrate(sym_expr, self.x)
-                latex_expr = latex(sym_expr)
-                latex_result = latex(result)
+                sym_expr = cached_sympify(expr)
+                result, tier = integrate_tiered(
+                    sym_expr, self.x, None if budget is None else min(budget, INTEGRATION_BUDGET)
+                )
+                latex_expr = to_latex(sym_expr)
+                if result is None:
+                    reason = "time budget" if tier == "budget" else "available methods"
+                    return {
+                        "answer": (
+                            f"Problem: Integrate {expr}\n\n"
+                            f"Step 1: Parsed expression: ${latex_expr}$\n\n"
+                            f"No closed-form antiderivative was found within the {reason}."
+                        ),
+                        "solution": "",
+                        "confidence": 0.0,
+                    }
+                latex_result = to_latex(result)
 
                 answer = (
                     f"Problem: Integrate {expr}\n\n"
@@ -56,10 +73,10 @@ class MathSolver:
             # ✅ Handle differentiation
             if re.search(r"(?i)d/dx|differentiate", q):
                 expr = re.sub(r"(?i)d/dx|differentiate", "", q).strip()
-                sym_expr = sympify(expr)
+                sym_expr = cached_sympify(expr)
                 result = diff(sym_expr, self.x)
-                latex_expr = latex(sym_expr)
-                latex_result = latex(result)
+                latex_expr = to_latex(sym_expr)
+                latex_result = to_latex(result)
 
                 answer = (
                     f"Problem: Differentiate {expr}\n\n"
@@ -69,24 +86,36 @@ class MathSolver:
                 )
                 return {"answer": answer, "solution": latex_result, "confidence": 1.0}
 
+            # ✅ Handle systems of equations ("x + y = 3, x - y = 1")
+            if "==" not in q and q.count("=") > 1:
+                return self.solve_system(q)
+
             # ✅ Handle equation solving
             if "==" not in q and "=" in q:
                 q = q.replace("=", "==")
 
             if "==" in q:
                 lhs, rhs = q.split("==")
-                lhs_expr = parse_expr(lhs.strip(), evaluate=False)
-                rhs_expr = parse_expr(rhs.strip(), evaluate=False)
+                lhs_expr = cached_parse(lhs, evaluate=False)
+                rhs_expr = cached_parse(rhs, evaluate=False)
                 eq = Eq(lhs_expr, rhs_expr)
             else:
-                expr = parse_expr(q.strip(), evaluate=False)
+                expr = cached_parse(q, evaluate=False)
                 eq = Eq(expr, 0)
 
-            result = solve(eq)
-            latex_eq = latex(eq)
+            latex_eq = to_latex(eq)
+
+            # Fast path: exact closed-form / numerically confirmed polynomial roots
+            result = None
+            if len(eq.free_symbols) == 1:
+                result = solve_polynomial(eq.lhs - eq.rhs, next(iter(eq.free_symbols)))
+            if result is not None:
+                latex_results = [to_latex(r) for r in result]
+            else:
+                result = solve(eq)
+                latex_results = [to_latex(simplify(r)) for r in result]
 
             if result:
-                latex_results = [latex(simplify(r)) for r in result]
                 latex_final = ", ".join(latex_results)
 
                 answer = (
@@ -117,3 +146,39 @@ class MathSolver:
                 "solution": "",
                 "confidence": 0.0,
             }
+
+    def solve_system(self, q: str) -> dict:
+        """Solve equations separated by ',', ';' or 'and' (linear fast path first)."""
+        parts = [p.strip() for p in re.split(r",|;|\band\b", q) if p.strip()]
+        if not all(p.count("=") == 1 for p in parts):
+            raise ValueError("Each equation in a system needs exactly one '='")
+        eqs = []
+        for part in parts:
+            lhs, rhs = part.split("=")
+            eqs.append(Eq(cached_parse(lhs), cached_parse(rhs)))
+        unknowns = sorted(set().union(*(e.free_symbols for e in eqs)), key=lambda s: s.name)
+
+        solution = solve_linear_system([e.lhs - e.rhs for e in eqs], unknowns)
+        if solution is None:
+            found = solve(eqs, unknowns, dict=True)
+            solution = found[0] if len(found) == 1 else None
+        latex_system = ", \\; ".join(to_latex(e) for e in eqs)
+
+        if not solution:
+            return {
+                "answer": (
+                    "I couldn't solve this mathematical problem.\n\n"
+                    "Step 1: The system has no unique solution."
+                ),
+                "solution": "",
+                "confidence": 0.0,
+            }
+
+        latex_final = ", ".join(f"{to_latex(v)} = {to_latex(solution[v])}" for v in unknowns if v in solution)
+        answer = (
+            f"Problem: Solve ${latex_system}$\n\n"
+            f"Step 1: System parsed as ${latex_system}$\n\n"
+            f"Step 2: Solve the linear system\n\n"
+            f"Final Answer: ${latex_final}$"
+        )
+        return {"answer": answer, "solution": latex_final, "confidence": 1.0}
@@ -0,0 +1,54 @@
+"""
+In-process counters and timings, served by GET /metrics.
+
+Deliberately tiny: named counters plus count/total/max timings, guarded by a
+lock so solver threads can record from anywhere. Each worker process keeps its
+own numbers (see server.py); aggregate across workers in whatever scrapes the
+endpoint.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = {}
+        self._started = time.time()
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            t = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            t["count"] += 1
+            t["total"] += seconds
+            t["max"] = max(t["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {
+                name: dict(t, mean=t["total"] / t["count"] if t["count"] else 0.0)
+                for name, t in self._timings.items()
+            }
+            return {
+                "uptime_seconds": round(time.time() - self._started, 1),
+                "counters": dict(self._counters),
+                "timings": timings,
+            }
+
+
+metrics = Metrics()
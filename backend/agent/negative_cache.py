@@ -0,0 +1,96 @@
+"""
+Negative cache for known KB misses.
+
+Questions whose best KB score stays below a threshold keep scoring below it
+until the collection changes, yet every repeat used to pay an embedding and
+a Qdrant search. Misses are recorded in a per-process Bloom filter keyed on
+(collection, threshold, KB filters, normalized question) and checked before
+searching. Each collection's filter is dropped as soon as its KB version
+changes (agent/kb_version.py) and reset when it reaches KB_MISS_CACHE_SIZE
+entries, so memory stays bounded. A false positive (rate KB_MISS_CACHE_ERROR_RATE)
+skips the KB for a question that was never searched; the router then falls
+through to the next stage as it would on a real miss.
+
+Only genuine misses are recorded: an empty search, or a hit below the KB
+stage's confidence threshold. Skipped or failed searches never are.
+"""
+import hashlib
+import math
+import os
+import threading
+
+from agent.answer_cache import normalize_question
+from agent.kb_schema import filter_key
+from agent.kb_version import get_kb_version
+from agent.metrics import metrics
+
+MISS_CACHE_SIZE = int(os.getenv("KB_MISS_CACHE_SIZE", 100000))
+MISS_CACHE_ERROR_RATE = float(os.getenv("KB_MISS_CACHE_ERROR_RATE", 0.001))
+MISS_CACHE_ENABLED = os.getenv("KB_MISS_CACHE_ENABLED", "1") == "1"
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class NegativeCache:
+    def __init__(self, capacity: int = MISS_CACHE_SIZE, error_rate: float = MISS_CACHE_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filters = {}  # collection -> (kb_version, BloomFilter)
+        self._lock = threading.Lock()
+
+    def _filter(self, collection: str) -> BloomFilter:
+        version = get_kb_version(collection)
+        current = self._filters.get(collection)
+        if current and current[0] == version and current[1].count < self.capacity:
+            return current[1]
+        with self._lock:
+            current = self._filters.get(collection)
+            if not current or current[0] != version or current[1].count >= self.capacity:
+                metrics.incr("kb_miss.reset" if current and current[0] == version else "kb_miss.new_version")
+                current = (version, BloomFilter(self.capacity, self.error_rate))
+                self._filters[collection] = current
+            return current[1]
+
+    @staticmethod
+    def _key(question: str, threshold: float, filters: dict = None) -> str:
+        return f"{threshold:.4f}|{filter_key(filters)}|{normalize_question(question)}"
+
+    def known_miss(self, collection: str, question: str, threshold: float, filters: dict = None) -> bool:
+        if self._key(question, threshold, filters) in self._filter(collection):
+            metrics.incr("kb_miss.hit")
+            return True
+        return False
+
+    def add(self, collection: str, question: str, threshold: float, filters: dict = None):
+        bloom = self._filter(collection)
+        with self._lock:
+            bloom.add(self._key(question, threshold, filters))
+        metrics.incr("kb_miss.added")
+
+    def stats(self) -> dict:
+        return {name: {"kb_version": version, "entries": bloom.count, "capacity": self.capacity}
+                for name, (version, bloom) in self._filters.items()}
+
+
+kb_misses = NegativeCache() if MISS_CACHE_ENABLED else None
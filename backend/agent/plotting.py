@@ -0,0 +1,204 @@
+"""
+Function sampling for graph/plot questions.
+
+An expression is parsed once (with the solver's own normalization), compiled
+to a NumPy function with `lambdify` and cached, so panning or zooming the same
+graph only pays for the vectorized evaluation. Sampling starts from a uniform
+grid and adaptively refines segments where the curve changes quickly; jumps
+that survive refinement are treated as discontinuities and broken with NaN so
+the frontend doesn't draw vertical lines across asymptotes.
+
+Expressions come straight from the /plot request, so only x, e, pi and a
+whitelist of math functions are accepted, and they are parsed against an
+explicit namespace without Python builtins.
+"""
+import logging
+import re
+from functools import lru_cache
+
+import numpy as np
+import sympy
+from sympy import (
+    Add, E, Float, Integer, Mul, Pow, Rational, Symbol, lambdify, latex, pi, postorder_traversal,
+)
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations
+
+from agent.math_solver import MathSolver
+
+logger = logging.getLogger(__name__)
+
+REFINE_PASSES = 6
+# A segment is refined when its rise exceeds this fraction of the plot's height.
+REFINE_FRACTION = 0.02
+# A steep minimal step is a jump if its rise is this many times its neighbours'.
+JUMP_RATIO = 4.0
+
+_x = Symbol("x")
+_normalizer = MathSolver()
+_PREFIX_RE = re.compile(r"(?i)^\s*(?:plot|graph|sketch|draw)?\s*(?:of|the)?\s*(?:(?:y|f\s*\(\s*x\s*\))\s*=)?")
+
+# /plot input is untrusted and parse_expr evaluates Python, so only these
+# names are allowed and they resolve against this table alone (no builtins).
+_FUNCTIONS = {
+    name: getattr(sympy, name)
+    for name in ("sin", "cos", "tan", "sec", "csc", "cot", "asin", "acos", "atan",
+                 "sinh", "cosh", "tanh", "asinh", "acosh", "atanh",
+                 "exp", "log", "sqrt", "Abs", "floor", "ceiling", "sign")
+}
+_FUNCTIONS.update({"ln": sympy.log, "abs": sympy.Abs, "arcsin": sympy.asin,
+                   "arccos": sympy.acos, "arctan": sympy.atan})
+_NAMES = dict(_FUNCTIONS, x=_x, e=E, pi=pi)
+_GLOBALS = {"__builtins__": {}, "Integer": Integer, "Float": Float, "Rational": Rational, "Symbol": Symbol,
+            "Add": Add, "Mul": Mul, "Pow": Pow}
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_]\w*")
+# "!" is factorial notation, which parse_expr would evaluate.
+_FORBIDDEN_RE = re.compile(r"__|\blambda\b|['\"\[\]!]|\.\s*[A-Za-z_]")
+# Constant powers are evaluated while parsing, so towers such as 9^9^9 are
+# refused before that happens.
+MAX_EXPONENT = 1000
+MAX_DIGITS = 1000
+
+
+class PlotError(ValueError):
+    """The expression can't be plotted as a real function of x."""
+
+
+def _parse(text: str, evaluate: bool = True):
+    return parse_expr(text, local_dict=dict(_NAMES), global_dict=dict(_GLOBALS),
+                      transformations=standard_transformations, evaluate=evaluate)
+
+
+def _check_powers(expr):
+    """Reject constant powers that would be too large to evaluate (unevaluated `expr`)."""
+    for node in postorder_traversal(expr):
+        if not isinstance(node, Pow) or node.exp.free_symbols:
+            continue
+        exponent = abs(node.exp.evalf())
+        if not exponent.is_finite or exponent > MAX_EXPONENT:
+            raise PlotError(f"Exponents are limited to {MAX_EXPONENT}")
+        if node.base.free_symbols:
+            continue
+        base = abs(node.base.evalf())
+        if base.is_zero is False and exponent * abs(sympy.log(base, 10).evalf()) > MAX_DIGITS:
+            raise PlotError("Constant is too large to evaluate")
+
+
+@lru_cache(maxsize=256)
+def compile_function(expression: str):
+    """Parse and compile `expression` once; returns (sympy expr, numpy function, LaTeX)."""
+    text = _PREFIX_RE.sub("", expression, count=1).strip().rstrip("?")
+    text = _normalizer.normalize_equation(text)
+    if _FORBIDDEN_RE.search(text):
+        raise PlotError("Expression contains unsupported syntax")
+    unknown = sorted(set(_IDENTIFIER_RE.findall(text)) - set(_NAMES))
+    if unknown:
+        raise PlotError(f"Unsupported names in expression: {', '.join(unknown)}")
+    try:
+        _check_powers(_parse(text, evaluate=False))
+        expr = _parse(text)
+    except PlotError:
+        raise
+    except Exception as e:
+        raise PlotError(f"Could not parse expression: {e}")
+    if expr.free_symbols - {_x}:
+        names = ", ".join(sorted(str(s) for s in expr.free_symbols - {_x}))
+        raise PlotError(f"Expression must be a function of x only (found {names})")
+    try:
+        return expr, lambdify(_x, expr, "numpy"), latex(expr)
+    except ValueError as e:
+        # e.g. a constant past Python's int/str conversion limit
+        raise PlotError(f"Could not compile expression: {e}")
+
+
+def _evaluate(fn, xs: np.ndarray) -> np.ndarray:
+    with np.errstate(all="ignore"):
+        ys = np.asarray(fn(xs), dtype=complex)
+    ys = np.broadcast_to(ys, xs.shape)
+    real = np.where(np.abs(ys.imag) <= 1e-12 * np.maximum(1.0, np.abs(ys.real)), ys.real, np.nan)
+    real[~np.isfinite(real)] = np.nan
+    return real
+
+
+def _height(ys: np.ndarray) -> float:
+    finite = ys[np.isfinite(ys)]
+    if finite.size < 2:
+        return 1.0
+    lo, hi = np.percentile(finite, [2, 98])
+    return max(hi - lo, 1e-12)
+
+
+def _refine(fn, xs, ys, passes):
+    height = _height(ys)
+    for _ in range(passes):
+        dy = np.abs(np.diff(ys))
+        finite_change = np.isfinite(ys[:-1]) != np.isfinite(ys[1:])
+        steep = (dy > REFINE_FRACTION * height) | finite_change
+        if not steep.any():
+            break
+        mids = (xs[:-1][steep] + xs[1:][steep]) / 2
+        xs = np.concatenate([xs, mids])
+        ys = np.concatenate([ys, _evaluate(fn, mids)])
+        order = np.argsort(xs, kind="stable")
+        xs, ys = xs[order], ys[order]
+    return xs, ys, height
+
+
+def _break_jumps(xs, ys, height, min_step):
+    """
+    Find segments that stayed steep at the finest step and look like a jump
+    rather than a steep curve: the rise dwarfs both neighbours (steps) or
+    goes against them (poles such as 1/x or tan(x)).
+    """
+    d = np.diff(ys)
+    dy = np.abs(d)
+    prev_d = np.concatenate([[0.0], d[:-1]])
+    next_d = np.concatenate([d[1:], [0.0]])
+    isolated = dy > JUMP_RATIO * np.maximum(np.abs(prev_d), np.abs(next_d))
+    against = (np.sign(prev_d) == np.sign(next_d)) & (np.sign(prev_d) == -np.sign(d))
+    candidate = (dy > REFINE_FRACTION * height) & (np.diff(xs) <= min_step * 1.01)
+    with np.errstate(invalid="ignore"):
+        jumps = np.flatnonzero(candidate & (isolated | against))
+    if jumps.size == 0:
+        return xs, ys, []
+    at = (xs[jumps] + xs[jumps + 1]) / 2
+    xs = np.insert(xs, jumps + 1, at)
+    ys = np.insert(ys, jumps + 1, np.nan)
+    return xs, ys, at.tolist()
+
+
+def _downsample(xs, ys, max_points):
+    """Min/max decimation per bucket: keeps peaks and NaN breaks visible."""
+    if xs.size <= max_points:
+        return xs, ys
+    buckets = np.array_split(np.arange(xs.size), max_points // 2)
+    keep = []
+    for idx in buckets:
+        seg = ys[idx]
+        if np.isnan(seg).any():
+            keep.append(idx[np.flatnonzero(np.isnan(seg))[0]])
+        finite = idx[np.isfinite(seg)]
+        if finite.size:
+            keep.append(finite[np.argmin(ys[finite])])
+            keep.append(finite[np.argmax(ys[finite])])
+    keep = np.unique(keep)
+    return xs[keep], ys[keep]
+
+
+def sample_function(expression: str, x_min: float, x_max: float,
+                    points: int = 400, max_points: int = 2000) -> dict:
+    """Sample `expression` over [x_min, x_max] with adaptive refinement."""
+    if not x_min < x_max:
+        raise PlotError("x_min must be smaller than x_max")
+    _, fn, rendered = compile_function(expression.strip())
+    xs = np.linspace(x_min, x_max, points)
+    ys = _evaluate(fn, xs)
+    xs, ys, height = _refine(fn, xs, ys, REFINE_PASSES)
+    min_step = (x_max - x_min) / (points - 1) / 2**REFINE_PASSES
+    xs, ys, breaks = _break_jumps(xs, ys, height, min_step)
+    xs, ys = _downsample(xs, ys, max_points)
+    return {
+        "latex": rendered,
+        "x": xs,
+        "y": ys,
+        "discontinuities": breaks,
+    }
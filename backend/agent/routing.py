@@ -1,9 +1,19 @@
-from agent.knowledge_base import search_knowledge_base
+from agent.knowledge_base import search_knowledge_base, generate_embedding
 from agent.web_search import search_web_and_generate, query_ollama_direct
 from agent.guardrails import validate_input, sanitize_output, rejection_message
 from agent.math_solver import MathSolver
-from agent.verifier import verify_answer
+from agent.verifier import verify, REFUTED
+from agent.transforms import solve_transform
+from agent.arithmetic import evaluate_arithmetic
+from agent.answer_cache import answer_cache
+from agent.kb_version import get_kb_version
+from agent.negative_cache import kb_misses
+from agent.semantic_cache import semantic_cache
+from agent.admission import limit, Overloaded
+from agent.deadline import Deadline
+from agent.timebox import Saturated, stages
 import logging
+import re
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,22 +27,40 @@ def normalize_input(text: str) -> str:
     return text.replace("²", "^2").replace("³", "^3")
 
 
-def route_question(question: str) -> dict:
+def route_question(question: str, deadline: Deadline = None, kb_filters: dict = None,
+                   on_event=None) -> dict:
     """
     Intelligent routing system for math-only questions.
-    1. Normalize input
+    1. Normalize input (plain arithmetic is answered right here, exactly)
     2. Validate input with guardrails
-    3. Try Knowledge Base (Qdrant)
-    4. Try SymPy Math Solver
-    5. Try Hardcoded formulas (Laplace, etc.)
-    6. Reject all non-math queries cleanly
+       (then serve from the shared answer cache when possible)
+    3. Classify the question and pick its stage order (STAGE_ORDER) from:
+       (questions that start at the KB are first looked up in the semantic
+       cache, with the embedding the KB stage then reuses)
+       Knowledge Base (Qdrant), SymPy Math Solver, transform engine (Laplace, etc.)
+       Stages without enough of the request's deadline left are skipped and
+       listed in "skipped_stages".
+    4. Reject all non-math queries cleanly
+    `kb_filters` scope the KB search (see search_knowledge_base); filtered
+    requests bypass the answer cache, which is keyed by question alone.
+    `on_event`, if given, is called (from this thread) with a dict for each
+    step of the way: "guardrails", "cache", "route", "stage" (started /
+    skipped / finished) and "kb_search" with the best score.
     """
+    deadline = deadline or Deadline()
 
     # Step 0: Normalize Unicode
     question = normalize_input(question)
 
+    result = _arithmetic_stage(question, deadline)
+    if result:
+        _emit(on_event, "stage", stage="arithmetic", status="finished", found=True)
+        return result
+
     # Step 1: Input validation (reject non-math questions)
-    if not validate_input(question):
+    passed = validate_input(question)
+    _emit(on_event, "guardrails", passed=passed)
+    if not passed:
         logger.warning(f"🚫 Non-math question rejected: {question[:80]}...")
         return {
             "answer": rejection_message(),  # clean, friendly message
@@ -43,13 +71,168 @@ def route_question(question: str) -> dict:
             "final_answer": rejection_message(),
         }
 
-    logger.info(f"📝 Routing math question: {question[:80]}...")
+    kb_version = get_kb_version()
+    use_cache = answer_cache is not None and not kb_filters
+    if use_cache:
+        cached = answer_cache.get(question, kb_version)
+        if cached:
+            logger.info(f"⚡ Answer cache hit ({cached.get('source')})")
+            _emit(on_event, "cache", cache="answer", hit=True)
+            return cached
+
+    question_type = classify_question(question)
+    stages = STAGE_ORDER[question_type]
+    embedding, semantic_hit, audit = None, None, False
+    if semantic_cache and not kb_filters and stages[0] == "kb" and deadline.has(STAGE_MIN_BUDGET["kb"]):
+        embedding = generate_embedding(question, timeout=deadline.timeout(30))
+        semantic_hit, audit = semantic_cache.lookup(question, embedding, kb_version)
+        if semantic_hit and not audit:
+            _emit(on_event, "cache", cache="semantic", hit=True,
+                  similarity=semantic_hit["semantic_match"]["similarity"])
+            return semantic_hit
+
+    logger.info(f"📝 Routing {question_type} question: {question[:80]}...")
+    _emit(on_event, "route", question_type=question_type, stages=list(stages))
+    result = run_stages(question, stages, deadline, kb_filters, on_event)
+    result["question_type"] = question_type
+    if semantic_hit:
+        semantic_cache.audit(semantic_hit, result)
+    # Answers produced with stages skipped for time aren't the full pipeline's answer.
+    if result.get("source") != "none" and not result["skipped_stages"]:
+        if use_cache:
+            answer_cache.put(question, kb_version, result)
+        if embedding:
+            semantic_cache.put(question, embedding, kb_version, result)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Pre-router: cheap lexical classification deciding which stages run, in what
+# order. Bare expressions go straight to SymPy (skipping the embedding model
+# and Qdrant), long word problems skip SymPy, which can never parse them.
+# ---------------------------------------------------------------------------
+
+_TRANSFORM_RE = re.compile(r"(?i)\b(laplace|fourier|z-transform)\b")
+_CALCULUS_RE = re.compile(r"(?i)\b(integrate|integral|differentiate|derivative)\b|d/dx|∫")
+_WORD_RE = re.compile(r"[a-zA-Z]{3,}")
+
+_FUNCTION_WORDS = {
+    "sin", "cos", "tan", "sec", "csc", "cot", "log", "exp", "sqrt",
+    "sinh", "cosh", "tanh", "asin", "acos", "atan",
+}
+_COMMAND_WORDS = {
+    "solve", "simplify", "evaluate", "calculate", "compute", "find", "factor",
+    "expand", "integrate", "integral", "differentiate", "derivative", "the",
+    "what", "for", "and",
+}
+# Questions with at least this many non-command words are prose, not formulas.
+WORD_PROBLEM_MIN_WORDS = 8
+
+STAGE_ORDER = {
+    "symbolic": ("sympy", "kb"),
+    "calculus": ("sympy", "kb"),
+    "transform": ("transform", "kb"),
+    "word_problem": ("kb",),
+    "general": ("kb", "sympy", "transform"),
+}
+# Order used before the pre-router existed; kept for evaluation.
+LEGACY_STAGE_ORDER = STAGE_ORDER["general"]
+
+
+def classify_question(question: str) -> str:
+    """Classify a question from lexical features alone (no parsing, no model)."""
+    if _TRANSFORM_RE.search(question):
+        return "transform"
+    words = [w.lower() for w in _WORD_RE.findall(question)]
+    prose = [w for w in words if w not in _FUNCTION_WORDS and w not in _COMMAND_WORDS]
+    if len(prose) >= WORD_PROBLEM_MIN_WORDS:
+        return "word_problem"
+    if _CALCULUS_RE.search(question) and len(prose) <= 2:
+        return "calculus"
+    if not prose:
+        return "symbolic"
+    return "general"
+
+
+def run_stages(question: str, stages, deadline: Deadline = None, kb_filters: dict = None,
+               on_event=None) -> dict:
+    """
+    Run `question` through `stages` in order and return the first answer.
+    Stages needing more than the deadline has left are skipped. Every stage
+    takes `kb_filters` and `on_event`; only the KB stage uses them.
+    """
+    deadline = deadline or Deadline()
+    skipped = []
+    for name in stages:
+        if not deadline.has(STAGE_MIN_BUDGET[name]):
+            logger.warning(f"⏱️ Skipping {name} stage: {deadline.remaining():.2f}s left")
+            skipped.append(name)
+            _emit(on_event, "stage", stage=name, status="skipped")
+            continue
+        _emit(on_event, "stage", stage=name, status="started")
+        result = STAGES[name](question, deadline, kb_filters, on_event)
+        _emit(on_event, "stage", stage=name, status="finished", found=bool(result))
+        if result:
+            result["skipped_stages"] = skipped
+            return result
+
+    if skipped:
+        logger.error(f"❌ No answer before the deadline (skipped: {', '.join(skipped)})")
+    else:
+        logger.error("❌ All math solvers failed")
+    return {
+        "answer": "I couldn't solve this mathematical problem. Please try rephrasing or simplifying it.",
+        "steps": ["No suitable solver or formula found for this input."],
+        "solution": "",
+        "confidence": 0.0,
+        "source": "none",
+        "final_answer": "No solution found.",
+        "skipped_stages": skipped,
+    }
+
+
+def _emit(on_event, event_type: str, **data):
+    if on_event is None:
+        return
+    try:
+        on_event({"type": event_type, **data})
+    except Exception as e:
+        logger.warning(f"⚠️ Event callback failed: {e}")
+
 
-    # Step 2: Try Knowledge Base (Qdrant)
-    logger.info("🔍 Step 1: Searching Knowledge Base...")
-    kb_result = search_knowledge_base(question)
-    if kb_result and kb_result.get("confidence", 0) > 0.85:
+def _arithmetic_stage(question: str, deadline: Deadline = None, kb_filters: dict = None, on_event=None):
+    result = evaluate_arithmetic(question)
+    if not result:
+        return None
+    logger.info("⚡ Arithmetic evaluated exactly")
+    return {
+        "answer": result["answer"],
+        "steps": result["steps"],
+        "solution": result["solution"],
+        "confidence": result["confidence"],
+        "source": "arithmetic",
+        "final_answer": result["solution"],
+        "question_type": "arithmetic",
+    }
+
+
+def _kb_stage(question: str, deadline: Deadline, kb_filters: dict = None, on_event=None):
+    if kb_misses and kb_misses.known_miss(KB_COLLECTION, question, KB_MIN_CONFIDENCE, kb_filters):
+        logger.info("🚫 Known KB miss, skipping Knowledge Base")
+        return None
+    logger.info("🔍 Searching Knowledge Base...")
+    kb_result = search_knowledge_base(question, KB_COLLECTION, deadline=deadline, filters=kb_filters)
+    _emit(on_event, "kb_search", score=kb_result.get("confidence") if kb_result else None,
+          threshold=KB_MIN_CONFIDENCE)
+    if kb_result and kb_result.get("confidence", 0) <= KB_MIN_CONFIDENCE and kb_misses:
+        # A real hit that scores too low: it will keep doing so until the KB changes.
+        kb_misses.add(KB_COLLECTION, question, KB_MIN_CONFIDENCE, kb_filters)
+    if kb_result and kb_result.get("confidence", 0) > KB_MIN_CONFIDENCE:
         logger.info(f"✅ KB result found with confidence {kb_result.get('confidence', 0):.2f}")
+        check = _verify(question, kb_result.get("answer") or kb_result.get("solution", ""), deadline)
+        if check["status"] == REFUTED:
+            logger.warning(f"⚠️ KB answer failed {check['method']} verification; trying next stage")
+            return None
         return {
             "answer": sanitize_output(kb_result.get("answer", "")),
             "steps": kb_result.get("steps", []),
@@ -57,12 +240,20 @@ def route_question(question: str) -> dict:
             "confidence": float(kb_result.get("confidence", 0.95)),
             "source": "knowledge_base",
             "final_answer": kb_result.get("solution", ""),
+            "verified": check["status"],
+            "kb_point_id": kb_result.get("point_id"),
         }
+    return None
+
 
-    # Step 3: Try SymPy Math Solver
-    logger.info("🧮 Step 2: Trying SymPy solver...")
+def _sympy_stage(question: str, deadline: Deadline, kb_filters: dict = None, on_event=None):
+    logger.info("🧮 Trying SymPy solver...")
     try:
-        sympy_result = solver.solve_equation(question)
+        with limit("sympy"):
+            # The whole solve (parsing, solve, diff, ...) stops at the deadline,
+            # not just the integration tiers that `budget` bounds.
+            sympy_result = stages.run(solver.solve_equation, deadline.remaining(),
+                                      question, budget=deadline.remaining())
         if sympy_result and sympy_result.get("confidence", 0) > 0:
             logger.info("✅ SymPy result found")
             return {
@@ -72,50 +263,64 @@ def route_question(question: str) -> dict:
                 "confidence": float(sympy_result.get("confidence", 0.7)),
                 "source": "sympy",
                 "final_answer": sympy_result.get("solution", ""),
+                "verified": _verify(question, sympy_result.get("answer", ""), deadline)["status"],
             }
+    except Overloaded:
+        raise
+    except Saturated:
+        raise Overloaded("sympy")
+    except TimeoutError:
+        logger.warning("⏱️ SymPy solver stopped at the request deadline")
     except Exception as e:
         logger.error(f"❌ SymPy solver failed: {e}")
+    return None
 
-    # Step 4: Hardcoded fallbacks (Laplace transforms)
-    q_lower = question.lower()
-
-    if "laplace transform of t^3" in q_lower:
-        logger.info("📌 Hardcoded fallback hit: Laplace transform of t^3")
-        return {
-            "answer": "The Laplace transform of t³ is \\( \\frac{6}{s^4} \\).",
-            "steps": [
-                "We use the formula \\( \\mathcal{L}\\{t^n\\} = \\frac{n!}{s^{n+1}} \\).",
-                "Here, \\( n = 3 \\), so \\( 3! = 6 \\).",
-                "Thus, \\( \\mathcal{L}\\{t^3\\} = \\frac{6}{s^4} \\).",
-            ],
-            "solution": "\\frac{6}{s^4}",
-            "confidence": 1.0,
-            "source": "hardcoded",
-            "final_answer": "\\frac{6}{s^4}",
-        }
-
-    if "laplace transform of t^4" in q_lower:
-        logger.info("📌 Hardcoded fallback hit: Laplace transform of t^4")
-        return {
-            "answer": "The Laplace transform of t⁴ is \\( \\frac{24}{s^5} \\).",
-            "steps": [
-                "We use the formula \\( \\mathcal{L}\\{t^n\\} = \\frac{n!}{s^{n+1}} \\).",
-                "Here, \\( n = 4 \\), so \\( 4! = 24 \\).",
-                "Thus, \\( \\mathcal{L}\\{t^4\\} = \\frac{24}{s^5} \\).",
-            ],
-            "solution": "\\frac{24}{s^5}",
-            "confidence": 1.0,
-            "source": "hardcoded",
-            "final_answer": "\\frac{24}{s^5}",
-        }
 
-    # Step 5: Fallback (no web or Ollama)
-    logger.error("❌ All math solvers failed")
+def _transform_stage(question: str, deadline: Deadline, kb_filters: dict = None, on_event=None):
+    try:
+        with limit("sympy"):
+            result = stages.run(solve_transform, deadline.remaining(), question, budget=deadline.remaining())
+    except Saturated:
+        raise Overloaded("sympy")
+    except TimeoutError:
+        logger.warning("⏱️ Transform stopped at the request deadline")
+        return None
+    if not result:
+        return None
+    logger.info(f"📌 Transform resolved via {result['method']}")
     return {
-        "answer": "I couldn't solve this mathematical problem. Please try rephrasing or simplifying it.",
-        "steps": ["No suitable solver or formula found for this input."],
-        "solution": "",
-        "confidence": 0.0,
-        "source": "none",
-        "final_answer": "No solution found.",
+        "answer": result["answer"],
+        "steps": result["steps"],
+        "solution": result["solution"],
+        "confidence": result["confidence"],
+        "source": "transform",
+        "final_answer": result["solution"],
     }
+
+
+# Seconds of deadline a stage needs left before it is worth starting.
+STAGE_MIN_BUDGET = {
+    "arithmetic": 0.0,
+    "kb": 0.5,
+    "sympy": 0.5,
+    "transform": 0.3,
+}
+KB_COLLECTION = "math_kb"
+# KB answers need a score above this to be used.
+KB_MIN_CONFIDENCE = 0.85
+# Verification is skipped (status "unknown") with less than this left.
+VERIFY_MIN_BUDGET = 0.2
+
+
+def _verify(question: str, answer: str, deadline: Deadline) -> dict:
+    if not deadline.has(VERIFY_MIN_BUDGET):
+        return {"status": "unknown", "method": "skipped"}
+    return verify(question, answer)
+
+
+STAGES = {
+    "arithmetic": _arithmetic_stage,
+    "kb": _kb_stage,
+    "sympy": _sympy_stage,
+    "transform": _transform_stage,
+}
@@ -0,0 +1,173 @@
+"""
+Semantic response cache over recently answered questions.
+
+The answer cache (agent/answer_cache.py) only matches a question exactly and
+the KB only holds curated entries, so paraphrases of something answered a
+minute ago ran the whole pipeline again. This cache keeps the embeddings of
+recently answered questions, with their `route_question` results, in a small
+in-memory matrix and serves a new question when its cosine similarity to a
+cached one reaches SEMANTIC_CACHE_THRESHOLD (strict on purpose).
+
+Embeddings of "x^2-4=0" and "x^2+4=0" are nearly identical, so a hit must
+also pass a literal guard: the numbers, operators and single-letter
+variables of both questions (after reading "squared", "minus", "is", ...
+as symbols) have to agree.
+
+Entries are evicted LRU beyond SEMANTIC_CACHE_SIZE and dropped when the KB
+version changes. A SEMANTIC_CACHE_AUDIT_RATE share of hits is audited: the
+pipeline runs anyway and a hit whose answer differs counts as a false hit
+(semantic_cache.false_hit) and is evicted.
+"""
+import logging
+import os
+import random
+import re
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from agent.answer_cache import normalize_question
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 2000))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", 0.02))
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+
+_WORD_SYMBOLS = [
+    (r"\bsquared\b", "^2"), (r"\bcubed\b", "^3"), (r"\bplus\b", "+"), (r"\bminus\b", "-"),
+    (r"\btimes\b|\bmultiplied by\b", "*"), (r"\bdivided by\b|\bover\b", "/"),
+    (r"\bequals\b|\bis equal to\b|\bis\b", "="), (r"\bto the power of\b", "^"),
+]
+_WORD_SYMBOLS = [(re.compile(p, re.IGNORECASE), s) for p, s in _WORD_SYMBOLS]
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_OPERATOR_RE = re.compile(r"\*\*|[-+*/^=<>]")
+_VARIABLE_RE = re.compile(r"(?<![A-Za-z])[b-hj-zB-HJ-Z](?![A-Za-z])")
+
+
+def literal_signature(question: str):
+    """Numbers and operators (as multisets) and single-letter variables of a question."""
+    text = question
+    for pattern, symbol in _WORD_SYMBOLS:
+        text = pattern.sub(f" {symbol} ", text)
+    operators = ["^" if op == "**" else op for op in _OPERATOR_RE.findall(text)]
+    numbers = [float(n) for n in _NUMBER_RE.findall(text)]
+    return Counter(numbers), Counter(operators), frozenset(_VARIABLE_RE.findall(text))
+
+
+def _same_answer(a: dict, b: dict) -> bool:
+    def norm(result):
+        return re.sub(r"\s+", "", str(result.get("final_answer") or result.get("answer", "")))
+    return norm(a) == norm(b)
+
+
+class SemanticCache:
+    def __init__(self, capacity: int = SEMANTIC_CACHE_SIZE, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 audit_rate: float = SEMANTIC_CACHE_AUDIT_RATE):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self._clear(None)
+
+    def _clear(self, kb_version):
+        self._kb_version = kb_version
+        self._matrix = None  # capacity x dim, unit rows; free rows are all zero
+        self._slots = OrderedDict()  # normalized question -> row, least recently used first
+        self._entries = {}  # row -> (question, signature, result)
+        self._free = []
+
+    def _embed(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, question: str, embedding, kb_version: str):
+        """
+        (result, audit) for the closest cached question at or above the
+        threshold whose literals match, else (None, False). When `audit` is
+        True the caller should run the pipeline anyway and call `audit`.
+        """
+        vector = self._embed(embedding) if embedding else None
+        metrics.incr("semantic_cache.lookup")
+        with self._lock:
+            if kb_version != self._kb_version:
+                self._clear(kb_version)
+            if vector is None or self._matrix is None or vector.shape[0] != self._matrix.shape[1] or not self._slots:
+                metrics.incr("semantic_cache.miss")
+                return None, False
+            scores = self._matrix @ vector
+            row = int(np.argmax(scores))
+            similarity = float(scores[row])
+            if similarity < self.threshold:
+                metrics.incr("semantic_cache.miss")
+                return None, False
+            cached_question, signature, result = self._entries[row]
+            if signature != literal_signature(question):
+                metrics.incr("semantic_cache.guard_rejected")
+                return None, False
+            self._slots.move_to_end(normalize_question(cached_question))
+        metrics.incr("semantic_cache.hit")
+        logger.info(f"🧲 Semantic cache hit ({similarity:.3f}): {cached_question[:60]}")
+        audit = random.random() < self.audit_rate
+        if audit:
+            metrics.incr("semantic_cache.audited")
+        return dict(result, semantic_match={"question": cached_question, "similarity": similarity}), audit
+
+    def audit(self, hit: dict, fresh: dict):
+        """Compare an audited hit with the pipeline's own answer; evict on mismatch."""
+        if _same_answer(hit, fresh):
+            return
+        metrics.incr("semantic_cache.false_hit")
+        cached_question = hit["semantic_match"]["question"]
+        logger.warning(f"⚠️ Semantic cache false hit, evicting: {cached_question[:60]}")
+        with self._lock:
+            row = self._slots.pop(normalize_question(cached_question), None)
+            if row is not None:
+                self._release(row)
+
+    def _release(self, row: int):
+        self._matrix[row] = 0.0
+        self._entries.pop(row, None)
+        self._free.append(row)
+
+    def put(self, question: str, embedding, kb_version: str, result: dict):
+        vector = self._embed(embedding) if embedding else None
+        if vector is None:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            if kb_version != self._kb_version:
+                self._clear(kb_version)
+            if self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+                self._clear(kb_version)
+                self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+                self._free = list(range(self.capacity - 1, -1, -1))
+            if key in self._slots:
+                row = self._slots.pop(key)
+            elif self._free:
+                row = self._free.pop()
+            else:
+                _, row = self._slots.popitem(last=False)
+                metrics.incr("semantic_cache.evicted")
+            self._matrix[row] = vector
+            self._entries[row] = (question, literal_signature(question), result)
+            self._slots[key] = row
+
+    def stats(self) -> dict:
+        snapshot = metrics.snapshot().get("counters", {})
+        lookups = snapshot.get("semantic_cache.lookup", 0)
+        audited = snapshot.get("semantic_cache.audited", 0)
+        return {
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hit_rate": snapshot.get("semantic_cache.hit", 0) / lookups if lookups else 0.0,
+            "false_hit_rate": snapshot.get("semantic_cache.false_hit", 0) / audited if audited else 0.0,
+        }
+
+
+semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
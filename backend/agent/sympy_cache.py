@@ -0,0 +1,105 @@
+"""
+Shared memoization for SymPy parsing and LaTeX rendering, plus a bounded
+symbol table.
+
+Parsing a string and rendering an expression to LaTeX are pure functions of
+their input, and SymPy expressions are immutable, so results can be shared
+freely between requests and threads. Both caches are LRU-bounded (sizes from
+env); keys are the whitespace-normalized source text. The symbol table replaces
+the old unbounded `MathSingleton` dict: it interns at most SYMBOL_TABLE_SIZE
+short names and hands out uninterned symbols past that, so junk input can't
+grow it forever.
+"""
+import os
+import re
+import threading
+from functools import lru_cache
+
+from sympy import Symbol, latex, sympify
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations
+
+PARSE_CACHE_SIZE = int(os.getenv("SYMPY_PARSE_CACHE_SIZE", 2048))
+LATEX_CACHE_SIZE = int(os.getenv("SYMPY_LATEX_CACHE_SIZE", 2048))
+SYMBOL_TABLE_SIZE = int(os.getenv("SYMPY_SYMBOL_TABLE_SIZE", 256))
+
+_SYMBOL_NAME_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_]{0,15}$")
+
+
+def _key(text: str) -> str:
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(text: str, transformations, evaluate: bool):
+    return parse_expr(text, transformations=transformations, evaluate=evaluate)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _sympify(text: str):
+    return sympify(text)
+
+
+def cached_parse(text: str, transformations=standard_transformations, evaluate: bool = True):
+    """`parse_expr` memoized on the normalized text (transformations must be hashable)."""
+    return _parse(_key(text), transformations, evaluate)
+
+
+def cached_sympify(text: str):
+    """`sympify` of a string, memoized on the normalized text."""
+    return _sympify(_key(text))
+
+
+@lru_cache(maxsize=LATEX_CACHE_SIZE)
+def to_latex(expr) -> str:
+    """`latex(expr)`, memoized per expression."""
+    return latex(expr)
+
+
+class SymbolTable:
+    """Interns up to `max_size` symbols by name; later names are not retained."""
+
+    def __init__(self, max_size: int = SYMBOL_TABLE_SIZE):
+        self.max_size = max_size
+        self._symbols = {}
+        self._lock = threading.Lock()
+        self.overflow = 0
+
+    def get(self, name: str) -> Symbol:
+        symbol = self._symbols.get(name)
+        if symbol is not None:
+            return symbol
+        if not _SYMBOL_NAME_RE.match(name):
+            raise ValueError(f"Invalid symbol name: {name!r}")
+        with self._lock:
+            symbol = self._symbols.get(name)
+            if symbol is None:
+                symbol = Symbol(name)
+                if len(self._symbols) < self.max_size:
+                    self._symbols[name] = symbol
+                else:
+                    self.overflow += 1
+        return symbol
+
+    def get_many(self, names) -> list:
+        return [self.get(n) for n in names]
+
+    def __len__(self):
+        return len(self._symbols)
+
+
+symbol_table = SymbolTable()
+
+
+def cache_stats() -> dict:
+    """Hit/miss counts for /metrics."""
+    def info(fn):
+        i = fn.cache_info()
+        return {"hits": i.hits, "misses": i.misses, "size": i.currsize, "max_size": i.maxsize}
+
+    return {
+        "parse": info(_parse),
+        "sympify": info(_sympify),
+        "latex": info(to_latex),
+        "symbols": {"size": len(symbol_table), "max_size": symbol_table.max_size,
+                    "overflow": symbol_table.overflow},
+    }
@@ -0,0 +1,88 @@
+"""
+Run a blocking call with a time budget.
+
+SymPy has no cancellation hooks, so the call runs on a small shared pool and
+the caller simply stops waiting once the budget is spent. An abandoned call
+keeps its worker thread until it finishes on its own; the pool is bounded so
+runaway computations can't pile up unboundedly.
+
+There are two pools: `run_with_timeout` (TIMEBOX_WORKERS) for budgeted
+sub-steps such as integration tiers and the transform fallback, and `stages`
+(TIMEBOX_STAGE_WORKERS) for whole routing stages bounded by the request
+deadline. Stage calls themselves use the first pool, so they never wait on
+their own workers. When every worker of a pool is busy and some of them are
+held by abandoned calls, a new call raises `Saturated` at once instead of
+queueing behind them until its budget runs out. Saturation, timeouts and
+abandoned calls are counted in metrics (timebox.*) and in `timebox_stats()`.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from agent.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TIMEBOX_WORKERS = int(os.getenv("TIMEBOX_WORKERS", 4))
+TIMEBOX_STAGE_WORKERS = int(os.getenv("TIMEBOX_STAGE_WORKERS", 2 * (os.cpu_count() or 2)))
+
+
+class Saturated(TimeoutError):
+    """Every worker is busy and some are still running abandoned calls."""
+
+
+class TimeBox:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"timebox-{name}")
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._abandoned = 0
+
+    def run(self, fn, timeout: float, *args, **kwargs):
+        """Return `fn(*args, **kwargs)`, or raise TimeoutError after `timeout` seconds."""
+        if timeout <= 0:
+            raise TimeoutError("no time budget left")
+        with self._lock:
+            if self._busy >= self.workers and self._abandoned:
+                metrics.incr(f"timebox.{self.name}.saturated")
+                logger.warning(f"⏳ Timebox {self.name} saturated: {self._abandoned} abandoned calls still running")
+                raise Saturated(f"timebox {self.name} is saturated by abandoned calls")
+            self._busy += 1
+        call = {"abandoned": False}
+        future = self._pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._done(call))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                if not future.done():
+                    call["abandoned"] = True
+                    self._abandoned += 1
+            future.cancel()
+            metrics.incr(f"timebox.{self.name}.timeout")
+            raise TimeoutError(f"{getattr(fn, '__name__', 'call')} exceeded {timeout:.2f}s")
+
+    def _done(self, call: dict):
+        with self._lock:
+            self._busy -= 1
+            if call["abandoned"]:
+                self._abandoned -= 1
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "busy": self._busy, "abandoned": self._abandoned}
+
+
+_calls = TimeBox("call", TIMEBOX_WORKERS)
+stages = TimeBox("stage", TIMEBOX_STAGE_WORKERS)
+
+
+def run_with_timeout(fn, timeout: float, *args, **kwargs):
+    """Return `fn(*args, **kwargs)`, or raise TimeoutError after `timeout` seconds."""
+    return _calls.run(fn, timeout, *args, **kwargs)
+
+
+def timebox_stats() -> dict:
+    return {box.name: box.stats() for box in (_calls, stages)}
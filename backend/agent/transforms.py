@@ -0,0 +1,380 @@
+"""
+Table-driven integral transforms (Laplace, inverse Laplace, Z, Fourier).
+
+Requests such as "laplace transform of 3t^2 + e^{-2t} sin(4t)" are parsed,
+split by linearity and resolved term by term from a table of standard pairs
+plus the first-shift and multiplication-by-t^n rules, producing the steps as
+it goes. Only when the table cannot resolve a term does the engine fall back
+to SymPy's own transform routines, under a time budget. Results are memoized
+on the normalized request. Input naming anything besides the transform's
+variable, the constants a and b, and known functions is not transformed.
+"""
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from sympy import (
+    Add, Mul, Pow, E, Poly, Piecewise, Sum, Integer, apart, cos, cosh, diff, exp,
+    factorial, fourier_transform, inverse_laplace_transform, laplace_transform,
+    latex, oo, pi, simplify, sin, sinh, sqrt, summation, symbols, together,
+)
+from sympy.core.function import AppliedUndef
+from sympy.integrals.transforms import (
+    FourierTransform, InverseLaplaceTransform, LaplaceTransform,
+)
+from sympy.parsing.sympy_parser import (
+    parse_expr, standard_transformations, implicit_multiplication_application,
+    convert_xor,
+)
+from sympy.polys.polyerrors import BasePolynomialError
+
+from agent.timebox import run_with_timeout
+
+logger = logging.getLogger(__name__)
+
+SYMPY_BUDGET = float(os.getenv("TRANSFORM_SYMPY_BUDGET", 2.0))
+
+t, s, n, z, w, x = symbols("t s n z omega x")
+_a, _b = symbols("a b")
+
+_TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application, convert_xor)
+_LOCALS = {"t": t, "s": s, "n": n, "z": z, "x": x, "e": E, "pi": pi, "a": _a, "b": _b}
+
+_REQUEST_RE = re.compile(
+    r"(?i)\b(?P<inverse>inverse\s+)?(?P<kind>laplace|fourier|z)[\s-]*transform\s+of\s+(?P<expr>.+)$"
+)
+
+_NAMES = {
+    "laplace": ("Laplace transform", "\\mathcal{L}"),
+    "inverse_laplace": ("inverse Laplace transform", "\\mathcal{L}^{-1}"),
+    "z": ("Z-transform", "\\mathcal{Z}"),
+    "fourier": ("Fourier transform", "\\mathcal{F}"),
+}
+
+
+class _Unresolved(Exception):
+    """A term the pattern table has no rule for."""
+
+
+def parse_request(question: str) -> Optional[tuple]:
+    """Return (kind, expression string) for a transform question, else None."""
+    match = _REQUEST_RE.search(question.strip())
+    if not match:
+        return None
+    kind = match.group("kind").lower()
+    if match.group("inverse"):
+        if kind != "laplace":
+            return None
+        kind = "inverse_laplace"
+    expr = match.group("expr").strip().rstrip("?.! ")
+    return kind, expr
+
+
+# Function names accepted in any case; other identifiers are left as typed so
+# an unknown name isn't split into a product of single-letter symbols.
+_FUNCTION_NAMES = {
+    name: name for name in ("sin", "cos", "tan", "sinh", "cosh", "tanh", "exp", "sqrt", "log")
+}
+_FUNCTION_NAMES.update({"ln": "log", "heaviside": "Heaviside", "u": "Heaviside",
+                        "dirac": "DiracDelta", "delta": "DiracDelta"})
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_]\w*")
+
+# Symbols each transform's input may contain besides the constants a and b.
+_VARIABLES = {"laplace": {t}, "inverse_laplace": {s}, "z": {n}, "fourier": {t, x}}
+
+
+def _normalize_names(expr: str) -> str:
+    def repl(match):
+        name = match.group(0)
+        lowered = name.lower()
+        called = expr[match.end():].lstrip().startswith("(")
+        if lowered in _FUNCTION_NAMES and (called or len(name) > 1):
+            return _FUNCTION_NAMES[lowered]
+        return lowered if len(name) == 1 else name
+    return _IDENTIFIER_RE.sub(repl, expr)
+
+
+def _parse(expr: str):
+    cleaned = expr.replace("{", "(").replace("}", ")").replace("²", "^2").replace("³", "^3")
+    return parse_expr(_normalize_names(cleaned), local_dict=_LOCALS, transformations=_TRANSFORMATIONS)
+
+
+def _check_symbols(kind: str, f):
+    """Reject input with names the transform doesn't know (e.g. an unknown function)."""
+    unknown = f.free_symbols - _VARIABLES[kind] - {_a, _b}
+    if unknown or f.atoms(AppliedUndef):
+        raise _Unresolved(f)
+
+
+# ---------------------------------------------------------------------------
+# Laplace: table of standard pairs + linearity / shift / t^n rules
+# ---------------------------------------------------------------------------
+
+def _linear_in(expr, var):
+    """Return a for expr == a*var (a free of var), else None."""
+    a, rest = expr.as_independent(var, as_Add=False)
+    return a if rest == var else None
+
+
+def _laplace_base(g):
+    """Table lookup for a single function of t (no coefficient)."""
+    if g == 1:
+        return 1 / s, "\\mathcal{L}\\{1\\} = \\frac{1}{s}"
+    if g == t:
+        return 1 / s**2, "\\mathcal{L}\\{t\\} = \\frac{1}{s^2}"
+    if isinstance(g, Pow) and g.base == t and g.exp.is_Integer and g.exp > 0:
+        k = int(g.exp)
+        return (
+            factorial(k) / s**(k + 1),
+            f"\\mathcal{{L}}\\{{t^n\\}} = \\frac{{n!}}{{s^{{n+1}}}}, \\; n = {k}",
+        )
+    if g.func in (sin, cos, sinh, cosh):
+        b = _linear_in(g.args[0], t)
+        if b is None:
+            raise _Unresolved(g)
+        table = {
+            sin: (b / (s**2 + b**2), "\\mathcal{L}\\{\\sin(bt)\\} = \\frac{b}{s^2 + b^2}"),
+            cos: (s / (s**2 + b**2), "\\mathcal{L}\\{\\cos(bt)\\} = \\frac{s}{s^2 + b^2}"),
+            sinh: (b / (s**2 - b**2), "\\mathcal{L}\\{\\sinh(bt)\\} = \\frac{b}{s^2 - b^2}"),
+            cosh: (s / (s**2 - b**2), "\\mathcal{L}\\{\\cosh(bt)\\} = \\frac{s}{s^2 - b^2}"),
+        }
+        F, rule = table[g.func]
+        return F, f"{rule}, \\; b = {latex(b)}"
+    raise _Unresolved(g)
+
+
+def _laplace_term(g, steps):
+    """Transform one product of factors of t, recording the rule used."""
+    factors = Mul.make_args(g)
+
+    # First shifting theorem: L{e^{at} h(t)} = H(s - a)
+    exps = [f for f in factors if f.func == exp or (isinstance(f, Pow) and f.base == E)]
+    if exps:
+        exponent = Add(*[f.args[0] if f.func == exp else f.exp for f in exps])
+        a = _linear_in(exponent, t)
+        if a is None:
+            raise _Unresolved(g)
+        rest = Mul(*[f for f in factors if f not in exps])
+        H = _laplace_term(rest, steps)
+        steps.append(
+            f"First shifting theorem: \\( \\mathcal{{L}}\\{{e^{{at}}f(t)\\}} = F(s - a) \\), a = \\( {latex(a)} \\)"
+        )
+        return H.subs(s, s - a)
+
+    # Multiplication by t^n: L{t^n h(t)} = (-1)^n d^n/ds^n H(s)
+    powers = [f for f in factors if f == t or (isinstance(f, Pow) and f.base == t)]
+    rest = Mul(*[f for f in factors if f not in powers])
+    if powers and rest != 1:
+        k = Add(*[1 if f == t else f.exp for f in powers])
+        if not (k.is_Integer and k.is_positive):
+            raise _Unresolved(g)
+        H = _laplace_term(rest, steps)
+        steps.append(
+            f"Multiplication by \\( t^{{{k}}} \\): \\( \\mathcal{{L}}\\{{t^n f(t)\\}} = (-1)^n F^{{(n)}}(s) \\)"
+        )
+        return (-1)**int(k) * diff(H, s, int(k))
+
+    F, rule = _laplace_base(g)
+    steps.append(f"Use the identity \\( {rule} \\).")
+    return F
+
+
+def _laplace_table(f):
+    steps = []
+    terms = Add.make_args(f.expand())
+    if len(terms) > 1:
+        steps.append("By linearity, transform each term separately.")
+    total = 0
+    for term in terms:
+        coeff, g = term.as_independent(t, as_Add=False)
+        total += coeff * _laplace_term(g, steps)
+    return total, steps
+
+
+# ---------------------------------------------------------------------------
+# Inverse Laplace: partial fractions + table of standard pairs
+# ---------------------------------------------------------------------------
+
+def _inverse_term(term, steps):
+    num, den = term.as_numer_denom()
+    coeff, den = den.as_independent(s, as_Add=False)
+    num = num / coeff
+    if not num.has(s) and den.is_Pow and den.exp.is_Integer and Poly(den.base, s).degree() == 1:
+        k = int(den.exp)
+        root = -Poly(den.base, s).all_coeffs()[1] / Poly(den.base, s).all_coeffs()[0]
+        lead = Poly(den.base, s).all_coeffs()[0] ** k
+        steps.append(
+            "Use \\( \\mathcal{L}^{-1}\\{\\frac{1}{(s-a)^k}\\} = \\frac{t^{k-1}e^{at}}{(k-1)!} \\)"
+            f", a = \\( {latex(root)} \\), k = {k}."
+        )
+        return num / lead * t**(k - 1) * exp(root * t) / factorial(k - 1)
+    dpoly = Poly(den, s)
+    if not num.has(s) and dpoly.degree() == 1:
+        c1, c0 = dpoly.all_coeffs()
+        steps.append("Use \\( \\mathcal{L}^{-1}\\{\\frac{1}{s-a}\\} = e^{at} \\).")
+        return num / c1 * exp(-c0 / c1 * t)
+    npoly = Poly(num, s)
+    if dpoly.degree() == 2 and npoly.degree() <= 1:
+        c2, c1, c0 = dpoly.all_coeffs()
+        a = -c1 / (2 * c2)
+        b2 = c0 / c2 - a**2
+        if not (b2.is_positive):
+            raise _Unresolved(term)
+        b = sqrt(b2)
+        A, B = (npoly.all_coeffs() if npoly.degree() == 1 else (0, npoly.all_coeffs()[0]))
+        A, B = A / c2, B / c2
+        steps.append(
+            "Complete the square, \\( (s-a)^2 + b^2 \\), and use "
+            "\\( \\mathcal{L}^{-1}\\{\\frac{s-a}{(s-a)^2+b^2}\\} = e^{at}\\cos(bt) \\), "
+            "\\( \\mathcal{L}^{-1}\\{\\frac{b}{(s-a)^2+b^2}\\} = e^{at}\\sin(bt) \\)"
+            f", a = \\( {latex(a)} \\), b = \\( {latex(b)} \\)."
+        )
+        return exp(a * t) * (A * cos(b * t) + (A * a + B) / b * sin(b * t))
+    raise _Unresolved(term)
+
+
+def _inverse_laplace_table(F):
+    steps = []
+    terms = Add.make_args(apart(together(F), s))
+    if len(terms) > 1:
+        steps.append(f"Decompose into partial fractions: \\( {latex(Add(*terms))} \\).")
+    total = Integer(0)
+    for term in terms:
+        total += _inverse_term(term, steps)
+    return total, steps
+
+
+# ---------------------------------------------------------------------------
+# Z-transform: table of standard sequences (n >= 0)
+# ---------------------------------------------------------------------------
+
+def _z_term(g, steps):
+    if g == 1:
+        steps.append("Use \\( \\mathcal{Z}\\{1\\} = \\frac{z}{z-1} \\).")
+        return z / (z - 1)
+    if g == n:
+        steps.append("Use \\( \\mathcal{Z}\\{n\\} = \\frac{z}{(z-1)^2} \\).")
+        return z / (z - 1)**2
+    if g == n**2:
+        steps.append("Use \\( \\mathcal{Z}\\{n^2\\} = \\frac{z(z+1)}{(z-1)^3} \\).")
+        return z * (z + 1) / (z - 1)**3
+    if isinstance(g, Pow) and g.exp == n and not g.base.has(n):
+        steps.append(f"Use \\( \\mathcal{{Z}}\\{{a^n\\}} = \\frac{{z}}{{z-a}} \\), a = \\( {latex(g.base)} \\).")
+        return z / (z - g.base)
+    raise _Unresolved(g)
+
+
+def _z_table(f):
+    steps = []
+    terms = Add.make_args(f.expand())
+    if len(terms) > 1:
+        steps.append("By linearity, transform each term separately.")
+    total = 0
+    for term in terms:
+        coeff, g = term.as_independent(n, as_Add=False)
+        total += coeff * _z_term(g, steps)
+    return total, steps
+
+
+# ---------------------------------------------------------------------------
+# SymPy fallbacks (budgeted)
+# ---------------------------------------------------------------------------
+
+def _sympy_fallback(kind, f):
+    if kind == "laplace":
+        return laplace_transform(f, t, s, noconds=True)
+    if kind == "inverse_laplace":
+        return inverse_laplace_transform(f, s, t)
+    if kind == "z":
+        return simplify(summation(f * z**(-n), (n, 0, oo)))
+    var = t if f.has(t) else x
+    return fourier_transform(f, var, w)
+
+
+_TABLES = {
+    "laplace": _laplace_table,
+    "inverse_laplace": _inverse_laplace_table,
+    "z": _z_table,
+}
+
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+RESULT_CACHE_SIZE = 1024
+
+
+def transform(kind: str, expr: str, budget: float = None) -> Optional[dict]:
+    """
+    Resolve one transform request; memoized on (kind, expression). The SymPy
+    fallback gets min(budget, TRANSFORM_SYMPY_BUDGET) seconds; a timeout is
+    not memoized, since a later call may have more time.
+    """
+    key = (kind, expr)
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            return _results[key]
+
+    name, op = _NAMES[kind]
+    f = _parse(expr)
+    try:
+        _check_symbols(kind, f)
+    except _Unresolved:
+        logger.warning(f"⚠️ Unknown names in {name} input, not transforming: {expr}")
+        return None
+    method = "table"
+    try:
+        if kind not in _TABLES:
+            raise _Unresolved(f)
+        try:
+            result, steps = _TABLES[kind](f)
+        except BasePolynomialError as e:
+            # Not a rational function of the variable (e^(-2s)/s, 1/sqrt(s), ...).
+            raise _Unresolved(f) from e
+    except _Unresolved:
+        method = "sympy"
+        limit = SYMPY_BUDGET if budget is None else min(budget, SYMPY_BUDGET)
+        try:
+            result = run_with_timeout(_sympy_fallback, limit, kind, f)
+        except TimeoutError:
+            logger.warning(f"⏱️ SymPy {name} exceeded {limit:.2f}s budget: {expr}")
+            return None
+        if isinstance(result, Piecewise):
+            result = result.args[0].expr
+        if result is None or result.has(LaplaceTransform, InverseLaplaceTransform, FourierTransform, Sum):
+            result = None
+        else:
+            steps = [f"No table rule applies; computed the {name} with SymPy."]
+
+    answer = None
+    if result is not None:
+        latex_f, latex_result = latex(f), latex(result)
+        steps.append(f"Thus, \\( {op}\\{{{latex_f}\\}} = {latex_result} \\).")
+        answer = {
+            "answer": f"The {name} of \\( {latex_f} \\) is \\( {latex_result} \\).",
+            "steps": steps,
+            "solution": latex_result,
+            "confidence": 1.0,
+            "method": method,
+        }
+    with _results_lock:
+        _results[key] = answer
+        if len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return answer
+
+
+def solve_transform(question: str, budget: float = None) -> Optional[dict]:
+    """Answer a transform question, or None if it isn't one / can't be resolved."""
+    request = parse_request(question)
+    if not request:
+        return None
+    kind, expr = request
+    try:
+        return transform(kind, re.sub(r"\s+", " ", expr), budget)
+    except Exception as e:
+        logger.error(f"❌ Transform failed for {expr!r}: {e}")
+        return None
@@ -1,13 +1,276 @@
+"""
+Fast answer verification by numeric sampling.
 
-from sympy import sympify, simplify
-from sympy.parsing.sympy_parser import parse_expr
+A candidate answer (from the KB, SymPy or an LLM) is substituted back into the
+question and compared numerically at a handful of random sample points with a
+NumPy-compiled (`lambdify`) residual. Only when sampling is inconclusive (too
+few finite samples, or residuals near the tolerance) do we escalate to
+`simplify`, which is orders of magnitude slower.
 
-def verify_answer(question: str, answer: str) -> bool:
+Supported question shapes: equations in one unknown ("solve 2x+3=7"),
+derivatives ("differentiate x^3"), indefinite integrals ("integrate x^2") and
+limits ("lim(x→0) sin(x)/x"). Anything else is reported as "unknown" rather
+than guessed at. An equation is only refuted when it is the question verbatim
+(apart from a leading "solve"); if filler words had to be stripped to find
+it, a failed check is reported as "unknown".
+"""
+import logging
+import re
+
+import numpy as np
+from sympy import Symbol, diff, lambdify, simplify, E, I, pi
+from sympy.parsing.sympy_parser import (
+    parse_expr, standard_transformations, implicit_multiplication_application,
+    convert_xor,
+)
+
+logger = logging.getLogger(__name__)
+
+VERIFIED, REFUTED, UNKNOWN = "verified", "refuted", "unknown"
+
+SAMPLES = 8
+REL_TOL = 1e-6
+# Residuals between the tolerance and this factor of it are "ambiguous".
+AMBIGUOUS_FACTOR = 1e4
+
+_TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application, convert_xor)
+_LOCALS = {"e": E, "pi": pi, "π": pi}
+# In a proposed root, a bare "i" is the imaginary unit, never a variable.
+_VALUE_LOCALS = dict(_LOCALS, i=I)
+_rng = np.random.default_rng(1234)
+
+_DERIVATIVE_RE = re.compile(r"(?i)\b(differentiate|derivative of)\b|d/dx")
+_INTEGRAL_RE = re.compile(r"(?i)\b(integrate|integral of)\b|∫")
+_LIMIT_RE = re.compile(
+    r"(?i)lim\w*\s*\(?\s*([a-z])\s*(?:→|->|to)\s*([^)\s]+)\s*\)?\s*(.+)"
+)
+_FILLER_RE = re.compile(
+    r"(?i)\b(solve|find|the|value|of|for|what|is|if|evaluate|compute|calculate|"
+    r"differentiate|derivative|integrate|integral|with respect to x|wrt x)\b|d/dx|∫|\bdx\b|[?:]"
+)
+_FUNC_PREFIX_RE = re.compile(r"^\s*[a-z]\s*\(\s*[a-z]\s*\)\s*=")
+# The unknown named before the equation ("solve for x: 3x + 5 = 20").
+_STATED_VARIABLE_RE = re.compile(r"^\s*[a-z]\s+(?=[\w(])")
+_COMMAND_RE = re.compile(r"(?i)^\s*(solve|evaluate|compute|calculate)\b\s*:?")
+
+_LATEX_REPLACEMENTS = [
+    (r"\pm", "±"), (r"\mp", "∓"), (r"\left", ""), (r"\right", ""), (r"\cdot", "*"), (r"\times", "*"),
+    (r"\pi", "pi"), (r"\infty", "oo"), (r"\,", ""), (r"\ ", ""), ("$", ""),
+]
+_FRAC_RE = re.compile(r"\\[dt]?frac\{([^{}]*)\}\{([^{}]*)\}")
+_SQRT_RE = re.compile(r"\\sqrt\{([^{}]*)\}")
+_POW_RE = re.compile(r"\^\{([^{}]*)\}")
+_LATEX_FUNC_RE = re.compile(r"\\(sin|cos|tan|log|ln|exp|sec|csc|cot|sinh|cosh|tanh)")
+
+
+def _parse(text: str, local_dict=_LOCALS):
+    text = text.replace("²", "^2").replace("³", "^3").replace("−", "-")
+    return parse_expr(text.strip(), local_dict=local_dict, transformations=_TRANSFORMATIONS)
+
+
+def latex_to_text(text: str) -> str:
+    """Turn the small subset of LaTeX our solvers emit into parseable text."""
+    for old, new in _LATEX_REPLACEMENTS:
+        text = text.replace(old, new)
+    previous = None
+    while previous != text:
+        previous = text
+        text = _POW_RE.sub(r"^(\1)", text)
+        text = _FRAC_RE.sub(r"((\1)/(\2))", text)
+        text = _SQRT_RE.sub(r"sqrt(\1)", text)
+    text = _LATEX_FUNC_RE.sub(r"\1", text)
+    return text.replace("{", "(").replace("}", ")").replace("\\", "")
+
+
+def _strip_constant(text: str) -> str:
+    return re.sub(r"\+\s*C\b", "", text)
+
+
+def _final_part(answer: str) -> str:
+    """Pull the final result out of a worded answer ("... Final Answer: ...", "... is ...")."""
+    match = re.search(r"(?i)final answer:?(.*)", answer, re.S)
+    text = match.group(1) if match else answer
+    text = re.split(r"(?i)\bis\b|\bas\b", text)[-1]
+    return latex_to_text(text).strip().rstrip(".")
+
+
+def _result_expr(answer: str):
+    """The expression on the right of the final '=' of an answer."""
+    return _parse(_strip_constant(_final_part(answer).split("=")[-1]))
+
+
+def _candidate_values(answer: str, var: Symbol) -> list:
+    """Values proposed for `var` in answers like 'x = 2, -3' or 'x = 2 or x = 3'."""
+    text = latex_to_text(answer)
+    assigned = re.findall(
+        rf"\b{var.name}\s*(?:_\{{?\d\}}?)?\s*=\s*(.+?)(?=,|;|\bor\b|\band\b|\.\s|\.?$)",
+        text,
+    )
+    if not assigned:
+        assigned = [p for p in re.split(r",|\bor\b|\band\b|;", _final_part(answer)) if p.strip()]
+    return [_parse(v, _VALUE_LOCALS) for text in assigned for v in _expand_plus_minus(text)]
+
+
+def _expand_plus_minus(text: str) -> list:
+    """'1 ± sqrt(2)' stands for two values: '1 + sqrt(2)' and '1 - sqrt(2)'."""
+    if "±" not in text and "∓" not in text:
+        return [text]
+    return [text.replace("±", "+").replace("∓", "-"), text.replace("±", "-").replace("∓", "+")]
+
+
+def _sample_points(symbols, n=SAMPLES):
+    return {sym: _rng.uniform(-2.0, 2.0, n) + 0.1 for sym in symbols}
+
+
+def _numeric_status(residual, scale_expr=None):
+    """Sample `residual` at random points; VERIFIED/REFUTED, or None if ambiguous."""
+    free = sorted(residual.free_symbols, key=lambda s: s.name)
+    if not free:
+        try:
+            value = complex(residual.evalf())
+        except (TypeError, ValueError):
+            return None
+        scale = 1.0
+        if scale_expr is not None and not scale_expr.free_symbols:
+            try:
+                scale = max(1.0, abs(complex(scale_expr.evalf())))
+            except (TypeError, ValueError):
+                pass
+        values, scales = np.array([value]), np.array([scale])
+    else:
+        points = _sample_points(free)
+        args = [points[s] for s in free]
+        with np.errstate(all="ignore"):
+            values = np.asarray(lambdify(free, residual, "numpy")(*args), dtype=complex)
+            values = np.broadcast_to(values, args[0].shape)
+            if scale_expr is not None:
+                scale_fn = lambdify(free, scale_expr, "numpy")
+                scales = np.abs(np.broadcast_to(np.asarray(scale_fn(*args), dtype=complex), values.shape))
+                scales = np.maximum(scales, 1.0)
+            else:
+                scales = np.ones(values.shape)
+    finite = np.isfinite(values) & np.isfinite(scales)
+    if finite.sum() < min(3, values.size):
+        return None
+    error = np.abs(values[finite]) / scales[finite]
+    if np.all(error <= REL_TOL):
+        return VERIFIED
+    if np.any(error > REL_TOL * AMBIGUOUS_FACTOR):
+        return REFUTED
+    return None
+
+
+def _check(residual, scale_expr=None) -> dict:
+    status = _numeric_status(residual, scale_expr)
+    if status:
+        return {"status": status, "method": "sampling"}
     try:
-        if "limit" in question.lower():
-            return True
-        lhs = parse_expr(question.split("=")[0])
-        rhs = parse_expr(answer)
-        return simplify(lhs - rhs) == 0
+        status = VERIFIED if simplify(residual) == 0 else REFUTED
+        return {"status": status, "method": "symbolic"}
     except Exception:
-        return False
+        return {"status": UNKNOWN, "method": "symbolic"}
+
+
+def _question_body(question: str) -> str:
+    body = _FILLER_RE.sub(" ", question)
+    body = _FUNC_PREFIX_RE.sub("", body)
+    return body.strip()
+
+
+def _equation_body(question: str):
+    """
+    The equation in `question`, and whether it is the question verbatim apart
+    from a leading command word. Only then is the parse trusted to refute.
+    """
+    body = _STATED_VARIABLE_RE.sub("", _question_body(question))
+    plain = _COMMAND_RE.sub("", question).strip().rstrip("?.")
+    return body, re.sub(r"\s+", "", body) == re.sub(r"\s+", "", plain)
+
+
+def _verify_equation(question: str, answer: str) -> dict:
+    body, verbatim = _equation_body(question)
+    result = _check_roots(body, answer)
+    if result["status"] == REFUTED and not verbatim:
+        return {"status": UNKNOWN, "method": result["method"]}
+    return result
+
+
+def _check_roots(body: str, answer: str) -> dict:
+    lhs_text, rhs_text = body.split("=", 1)
+    lhs, rhs = _parse(lhs_text), _parse(rhs_text)
+    unknowns = sorted((lhs - rhs).free_symbols, key=lambda s: s.name)
+    if not unknowns:
+        return {"status": UNKNOWN, "method": "skipped"}
+    var = Symbol("x") if Symbol("x") in unknowns else unknowns[0]
+    values = _candidate_values(answer, var)
+    if not values or any(value.free_symbols - {var} for value in values):
+        # e.g. "x = n\pi": a family of roots, not something to sample.
+        return {"status": UNKNOWN, "method": "skipped"}
+    result = {"status": VERIFIED, "method": "sampling"}
+    for value in values:
+        check = _check((lhs - rhs).subs(var, value), abs(lhs.subs(var, value)) + abs(rhs.subs(var, value)))
+        if check["status"] != VERIFIED:
+            return check
+        if check["method"] == "symbolic":
+            result["method"] = "symbolic"
+    return result
+
+
+def _verify_derivative(question: str, answer: str) -> dict:
+    f = _parse(_question_body(question))
+    g = _result_expr(answer)
+    x = Symbol("x")
+    expected = diff(f, x)
+    return _check(expected - g, abs(expected) + abs(g))
+
+
+def _verify_integral(question: str, answer: str) -> dict:
+    f = _parse(_question_body(question))
+    g = _result_expr(answer)
+    x = Symbol("x")
+    derivative = diff(g, x)
+    return _check(derivative - f, abs(derivative) + abs(f))
+
+
+def _verify_limit(question: str, answer: str) -> dict:
+    match = _LIMIT_RE.search(question)
+    var, point = Symbol(match.group(1)), _parse(match.group(2))
+    f = _parse(match.group(3).strip().rstrip("?"))
+    value = complex(_result_expr(answer).evalf())
+    p = complex(point.evalf())
+    fn = lambdify(var, f, "numpy")
+    with np.errstate(all="ignore"):
+        samples = np.array([fn(p - h) for h in (1e-4, -1e-4, 1e-5, -1e-5)], dtype=complex)
+    if not np.all(np.isfinite(samples)):
+        return {"status": UNKNOWN, "method": "sampling"}
+    error = np.abs(samples - value) / max(1.0, abs(value))
+    if np.all(error < 1e-3):
+        return {"status": VERIFIED, "method": "sampling"}
+    if np.all(error > 1e-1):
+        return {"status": REFUTED, "method": "sampling"}
+    return {"status": UNKNOWN, "method": "sampling"}
+
+
+def verify(question: str, answer: str) -> dict:
+    """
+    Check `answer` against `question`.
+    Returns {"status": verified|refuted|unknown, "method": sampling|symbolic|skipped}.
+    """
+    if not question or not answer:
+        return {"status": UNKNOWN, "method": "skipped"}
+    try:
+        if _LIMIT_RE.search(question):
+            return _verify_limit(question, answer)
+        if _INTEGRAL_RE.search(question):
+            return _verify_integral(question, answer)
+        if _DERIVATIVE_RE.search(question):
+            return _verify_derivative(question, answer)
+        if question.count("=") == 1 and not _FUNC_PREFIX_RE.match(_FILLER_RE.sub(" ", question)):
+            return _verify_equation(question, answer)
+    except Exception as e:
+        logger.debug(f"Verification skipped for {question[:50]!r}: {e}")
+    return {"status": UNKNOWN, "method": "skipped"}
+
+
+def verify_answer(question: str, answer: str) -> bool:
+    return verify(question, answer)["status"] == VERIFIED
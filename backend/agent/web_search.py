@@ -3,6 +3,9 @@ import requests
 from dotenv import load_dotenv
 import logging
 
+from agent.admission import limit, Overloaded
+from agent.circuit_breaker import breakers, CircuitOpen
+
 # Load environment variables
 load_dotenv()
 
@@ -19,7 +22,7 @@ except Exception as e:
     logger.warning(f"⚠️ Tavily not available: {e}")
     client = None
 
-def query_ollama_mcp(question: str, context: str = "") -> dict:
+def query_ollama_mcp(question: str, context: str = "", deadline=None) -> dict:
     """Query Ollama model for math solution with optional context"""
     prompt = f"""You are a math tutor. Answer the following question with a step-by-step solution.
 Use Laplace transform identities only. For t^n, return n! / s^(n+1). Do not attempt symbolic integration unless explicitly asked.
@@ -28,11 +31,13 @@ Context: {context}
 Instructions: Use clear steps, simplify for a student. Show all work. If context is insufficient, return 'INSUFFICIENT_EXTERNAL_EVIDENCE'."""
 
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": "gemma:2b", "prompt": prompt, "stream": False},
-            timeout=60
-        )
+        with limit("llm"):
+            response = breakers["ollama"].call(
+                requests.post,
+                "http://localhost:11434/api/generate",
+                json={"model": "gemma:2b", "prompt": prompt, "stream": False},
+                timeout=deadline.timeout(60) if deadline else 60
+            )
         result = response.json()
         answer_text = result.get("response", "").strip()
 
@@ -54,6 +59,11 @@ Instructions: Use clear steps, simplify for a student. Show all work. If context
             "confidence": 0.85
         }
 
+    except Overloaded:
+        raise
+    except CircuitOpen:
+        logger.warning("⚠️ Ollama unavailable (circuit open)")
+        return None
     except Exception as e:
         logger.error(f"❌ Ollama MCP failed: {e}")
         return None
@@ -81,7 +91,7 @@ Retrieved Context:
 """
     return prompt.strip()
 
-def search_web_and_generate(question: str) -> dict:
+def search_web_and_generate(question: str, deadline=None) -> dict:
     """
     Search web using Tavily and generate response using Ollama MCP.
     Returns None if search fails.
@@ -92,7 +102,7 @@ def search_web_and_generate(question: str) -> dict:
 
     try:
         logger.info(f"🌐 Searching web for: {question[:50]}...")
-        results = client.search(query=question, max_results=5)
+        results = breakers["tavily"].call(client.search, query=question, max_results=5)
 
         if not results or not isinstance(results, list):
             logger.warning("⚠️ No valid web search results found")
@@ -107,7 +117,7 @@ def search_web_and_generate(question: str) -> dict:
         logger.info(f"✅ Retrieved {len(docs)} web results")
 
         prompt = package_mcp_context(question, docs)
-        result = query_ollama_mcp(question, prompt)
+        result = query_ollama_mcp(question, prompt, deadline)
 
         if result:
             logger.info("✅ Generated answer from web search")
@@ -116,11 +126,14 @@ def search_web_and_generate(question: str) -> dict:
 
         return result
 
+    except CircuitOpen:
+        logger.warning("⚠️ Tavily unavailable (circuit open)")
+        return None
     except Exception as e:
         logger.error(f"❌ Web search failed: {e}")
         return None
 
-def query_ollama_direct(question: str) -> dict:
+def query_ollama_direct(question: str, deadline=None) -> dict:
     """Query Ollama directly without web search (pure MCP fallback)."""
     logger.info(f"🤖 Querying Ollama directly: {question[:50]}...")
-    return query_ollama_mcp(question, "")
+    return query_ollama_mcp(question, "", deadline)
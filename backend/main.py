@@ -1,16 +1,99 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional
 import json, asyncio, os
-from datetime import datetime
+import numpy as np
+from dotenv import load_dotenv
 
-from agent.routing import route_question
-from agent.guardrails import validate_input, rejection_message, sanitize_output
+# Before any agent import: the agent modules read their settings at import time.
+load_dotenv()
+
+from agent.routing import route_question, normalize_input
+from agent.guardrails import validate_input, validate_batch, rejection_message, sanitize_output
+from agent.plotting import sample_function, PlotError
+from agent.metrics import metrics
+from agent.sympy_cache import cache_stats
+from agent.coalesce import SingleFlight
+from agent.answer_cache import normalize_question
+from agent.admission import Overloaded, admission_stats, limit, limiters
+from agent.circuit_breaker import breaker_stats
+from agent.deadline import Deadline
+from agent.timebox import timebox_stats
+from agent.kb_schema import filter_key
+from agent.negative_cache import kb_misses
+from agent.semantic_cache import semantic_cache
+from agent.feedback import store_feedback, get_feedback_stats
+from agent.knowledge_base import prefetch_knowledge_base
 
 app = FastAPI(title="Math Routing Agent API", version="1.0.0")
-FEEDBACK_FILE = "feedback.json"
+# Identical questions in flight at the same time share one pipeline run.
+inflight = SingleFlight()
+# /solve/batch: most questions per request, and how many solve at once
+# (by default as many as the SymPy stage has slots).
+SOLVE_BATCH_MAX = int(os.getenv("SOLVE_BATCH_MAX", 256))
+SOLVE_BATCH_PARALLELISM = int(os.getenv("SOLVE_BATCH_PARALLELISM", limiters["sympy"].concurrency))
+# /ws/solve: questions one connection may have in flight at once.
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", 4))
+# /solve/stream: seconds between heartbeat comments while a stage runs.
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 10))
+
+
+async def solve_coalesced(question: str, deadline: Deadline, kb_filters: dict = None) -> dict:
+    """
+    route_question off the event loop, shared by concurrent identical questions
+    (with identical KB filters). The shared run has its own deadline, kept
+    alive for the latest caller still waiting (agent/coalesce.py).
+    Raises TimeoutError when `deadline` expires.
+    """
+    try:
+        return await asyncio.wait_for(
+            inflight.run(
+                normalize_question(question) + (f" [{filter_key(kb_filters)}]" if kb_filters else ""),
+                lambda shared: run_in_threadpool(route_question, question, shared, kb_filters),
+                deadline,
+            ),
+            deadline.remaining(),
+        )
+    except asyncio.TimeoutError:
+        deadline.cancel()
+        metrics.incr("deadline.expired")
+        raise
+
+async def solve_with_events(question: str, deadline: Deadline, kb_filters: dict, on_event) -> dict:
+    """
+    route_question off the event loop, reporting progress to `on_event` (called
+    from the worker thread). Not coalesced: the events belong to one request.
+    Raises TimeoutError when `deadline` expires, cancelling it.
+    """
+    try:
+        return await asyncio.wait_for(
+            run_in_threadpool(route_question, question, deadline, kb_filters, on_event),
+            deadline.remaining(),
+        )
+    except asyncio.TimeoutError:
+        deadline.cancel()
+        metrics.incr("deadline.expired")
+        raise
+
+def _result_fields(result: dict) -> dict:
+    return {
+        "answer": sanitize_output(result["answer"]),
+        "steps": result["steps"],
+        "solution": result["solution"],
+        "confidence": result["confidence"],
+        "skipped_stages": result.get("skipped_stages", []),
+        "source": result.get("source", ""),
+        "kb_point_id": result.get("kb_point_id"),
+    }
+
+def _kb_filters(request) -> Optional[dict]:
+    """The request's non-empty KB filters, or None."""
+    if not request.filters:
+        return None
+    return {k: v for k, v in request.filters.model_dump().items() if v} or None
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,9 +106,22 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+class KBFilters(BaseModel):
+    topics: List[str] = []
+    difficulty: List[str] = []
+    sources: List[str] = []  # e.g. ["jee_gold", "physicswallahai"] for JEE-only mode
+    source_priority: List[str] = []  # preferred first among near-tied KB hits
+
 class MathRequest(BaseModel):
     question: str
     stream: bool = False
+    timeout: Optional[float] = None  # seconds; defaults to REQUEST_DEADLINE
+    filters: Optional[KBFilters] = None
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    timeout: Optional[float] = None  # seconds per question; defaults to REQUEST_DEADLINE
+    filters: Optional[KBFilters] = None
 
 class MathResponse(BaseModel):
     question: str
@@ -33,12 +129,28 @@ class MathResponse(BaseModel):
     steps: List[str]
     solution: str
     confidence: float
+    skipped_stages: List[str] = []
+    source: str = ""
+    kb_point_id: Optional[str] = None  # send back with /feedback
+
+class PlotRequest(BaseModel):
+    expression: str
+    x_min: float = -10.0
+    x_max: float = 10.0
+    points: int = 400
+    max_points: int = 2000
+    format: str = "json"  # "json" or "binary" (float32 x values, then y values)
 
 class FeedbackRequest(BaseModel):
     question: str
     answer: str
     rating: int
     comment: Optional[str] = ""
+    # From the /solve response, so curation can tie the rating to what answered.
+    source: Optional[str] = None
+    kb_point_id: Optional[str] = None
+    solution: str = ""
+    steps: List[str] = []
 
 class FeedbackResponse(BaseModel):
     status: str
@@ -53,6 +165,14 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Per-process counters and timings (integration tiers, caches, ...)."""
+    return {**metrics.snapshot(), "sympy_cache": cache_stats(), "admission": admission_stats(),
+            "breakers": breaker_stats(), "kb_misses": kb_misses.stats() if kb_misses else {},
+            "semantic_cache": semantic_cache.stats() if semantic_cache else {},
+            "timebox": timebox_stats()}
+
 @app.post("/solve", response_model=MathResponse)
 async def solve_math(request: MathRequest):
     try:
@@ -65,7 +185,7 @@ async def solve_math(request: MathRequest):
                 solution="",
                 confidence=0.0
             )
-        result = route_question(question)
+        result = await solve_coalesced(question, Deadline(request.timeout), _kb_filters(request))
         required_keys = ["answer", "steps", "solution", "confidence"]
         if not result or not all(k in result for k in required_keys):
             raise ValueError("Routing failed or incomplete result.")
@@ -74,91 +194,329 @@ async def solve_math(request: MathRequest):
             answer=sanitize_output(result["answer"]),
             steps=result["steps"],
             solution=result["solution"],
-            confidence=result["confidence"]
+            confidence=result["confidence"],
+            skipped_stages=result.get("skipped_stages", []),
+            source=result.get("source", ""),
+            kb_point_id=result.get("kb_point_id")
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out solving this question.")
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
         )
     except Exception:
         raise HTTPException(status_code=500, detail="Error fetching answer.")
 
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
 @app.post("/solve/stream")
-async def solve_math_stream(request: MathRequest):
+async def solve_math_stream(request: MathRequest, http_request: Request):
+    """
+    Server-sent events emitted as the question moves through the router: the
+    "question" right away, then "guardrails", "cache", "route", "stage"
+    (started / skipped / finished), "kb_search" (with its score), and finally
+    one "step" per solution step, "solution", "answer" and "done" (or "error").
+    Each event's data is JSON carrying the same "type". A heartbeat comment is
+    sent every SSE_HEARTBEAT seconds while a stage runs. If the client goes
+    away, the request's deadline is cancelled so no further stage starts.
+    """
+    question = request.question.strip()
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    deadline = Deadline(request.timeout)
+
+    def on_event(event: dict):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def generate():
+        yield _sse({"type": "question", "data": question})
+        if not validate_input(question):
+            yield _sse({"type": "answer", "data": rejection_message()})
+            yield _sse({"type": "done", "data": "Complete"})
+            return
+        solving = asyncio.ensure_future(solve_with_events(question, deadline, _kb_filters(request), on_event))
+        next_event = asyncio.ensure_future(events.get())
+        try:
+            while not solving.done():
+                done, _ = await asyncio.wait({solving, next_event}, timeout=SSE_HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if next_event in done:
+                    yield _sse(next_event.result())
+                    next_event = asyncio.ensure_future(events.get())
+                elif not done:
+                    if await http_request.is_disconnected():
+                        return
+                    yield ": heartbeat\n\n"
+            next_event.cancel()
+            while not events.empty():
+                yield _sse(events.get_nowait())
+
+            result = solving.result()
+            for i, step in enumerate(result["steps"], 1):
+                yield _sse({"type": "step", "data": step, "number": i})
+            yield _sse({"type": "solution", "data": result["solution"]})
+            yield _sse({"type": "answer", "data": sanitize_output(result["answer"]),
+                        **{k: v for k, v in _result_fields(result).items() if k not in ("answer", "steps")}})
+            yield _sse({"type": "done", "data": "Complete"})
+        except asyncio.TimeoutError:
+            yield _sse({"type": "error", "data": "Timed out solving this question."})
+        except Overloaded as e:
+            yield _sse({"type": "error", "data": "Server is busy, please retry shortly.",
+                        "retry_after": e.retry_after})
+        except Exception as e:
+            yield _sse({"type": "error", "data": str(e)})
+        finally:
+            # Also runs when the server cancels the stream on disconnect.
+            if not solving.done():
+                metrics.incr("stream.disconnected")
+                deadline.cancel()
+                solving.cancel()
+            next_event.cancel()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/solve/batch")
+async def solve_batch(request: BatchRequest):
+    """
+    Solve many questions; streams one NDJSON line per question as it
+    completes, tagged with its "index" in the request. All questions are
+    embedded in one batch and searched in one Qdrant round trip up front,
+    then solved SOLVE_BATCH_PARALLELISM at a time. A failing question yields
+    an "error" line and doesn't affect the others.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(request.questions) > SOLVE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SOLVE_BATCH_MAX} questions per batch")
+
+    questions = [q.strip() for q in request.questions]
+    valid = {i for i, ok in enumerate(validate_batch(questions)) if ok}
+    kb_filters = _kb_filters(request)
+    try:
+        await run_in_threadpool(
+            prefetch_knowledge_base, [normalize_input(questions[i]) for i in sorted(valid)],
+            filters=kb_filters, deadline=Deadline(request.timeout),
+        )
+    except Overloaded:
+        pass  # each question searches on its own, under admission control
+    slots = asyncio.Semaphore(SOLVE_BATCH_PARALLELISM)
+
+    async def solve_one(index: int) -> dict:
+        question = questions[index]
+        item = {"index": index, "question": question}
+        if index not in valid:
+            return {**item, "answer": rejection_message(), "steps": ["Non-mathematical query detected."],
+                    "solution": "", "confidence": 0.0}
+        async with slots:
+            deadline = Deadline(request.timeout)
+            try:
+                result = await solve_coalesced(question, deadline, kb_filters)
+            except asyncio.CancelledError:
+                deadline.cancel()
+                raise
+            except asyncio.TimeoutError:
+                return {**item, "error": "Timed out solving this question."}
+            except Overloaded as e:
+                return {**item, "error": "Server is busy, please retry shortly.", "retry_after": e.retry_after}
+            except Exception:
+                return {**item, "error": "Error fetching answer."}
+        return {**item, **_result_fields(result)}
+
     async def generate():
+        tasks = [asyncio.ensure_future(solve_one(i)) for i in range(len(questions))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client went away: stop questions that haven't finished.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/solve")
+async def solve_socket(websocket: WebSocket):
+    """
+    Many solve requests over one connection, multiplexed by client-chosen ID.
+
+    Client messages:
+        {"type": "solve", "id": "q1", "question": "...", "timeout": 10, "filters": {...}}
+        {"type": "cancel", "id": "q1"}
+    A solve reusing the ID of one still running supersedes it: the old run is
+    dropped silently and everything after the new "accepted" belongs to the
+    new question.
+    Server messages all carry the request's "id": "accepted", routing
+    progress ("guardrails", "cache", "route", "stage", "kb_search"), one
+    "step" per solution step, then "result", "error" or (after a cancel
+    message) "cancelled".
+    At most WS_MAX_INFLIGHT requests run per connection; more get an error.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    outbox = asyncio.Queue()
+    running = {}  # id -> (task, deadline)
+
+    def send(message: dict):
+        outbox.put_nowait(message)
+
+    async def sender():
+        while True:
+            await websocket.send_text(json.dumps(await outbox.get()))
+
+    async def handle(request_id: str, request: MathRequest, deadline: Deadline):
+        def forward(event: dict):
+            # Checked on the loop, so nothing follows a "cancelled" message.
+            if not deadline.cancelled:
+                send({"id": request_id, **event})
+
+        def on_event(event: dict):
+            loop.call_soon_threadsafe(forward, event)
+
+        question = request.question.strip()
         try:
-            question = request.question.strip()
             if not validate_input(question):
-                yield json.dumps({"type": "answer", "data": rejection_message()}) + "\n"
-                yield json.dumps({"type": "done", "data": "Complete"}) + "\n"
+                send({"id": request_id, "type": "result", "answer": rejection_message(),
+                      "steps": ["Non-mathematical query detected."], "solution": "", "confidence": 0.0})
                 return
-            result = route_question(question)
-            if not result:
-                yield json.dumps({"type": "error", "data": "Routing failed."}) + "\n"
-                return
-            yield json.dumps({"type": "question", "data": question}) + "\n"
-            yield json.dumps({"type": "status", "data": "Solving..."}) + "\n"
+            result = await solve_with_events(question, deadline, _kb_filters(request), on_event)
             for i, step in enumerate(result["steps"], 1):
-                yield json.dumps({"type": "step", "data": step, "number": i}) + "\n"
-            yield json.dumps({"type": "solution", "data": result["solution"]}) + "\n"
-            yield json.dumps({"type": "answer", "data": sanitize_output(result["answer"])}) + "\n"
-            yield json.dumps({"type": "done", "data": "Complete"}) + "\n"
-            await asyncio.sleep(0.05)
-        except Exception as e:
-            yield json.dumps({"type": "error", "data": str(e)}) + "\n"
-    return StreamingResponse(generate(), media_type="text/event-stream")
+                send({"id": request_id, "type": "step", "number": i, "data": step})
+            send({"id": request_id, "type": "result", **_result_fields(result)})
+        except asyncio.CancelledError:
+            deadline.cancel()
+            raise
+        except asyncio.TimeoutError:
+            send({"id": request_id, "type": "error", "data": "Timed out solving this question."})
+        except Overloaded as e:
+            send({"id": request_id, "type": "error", "data": "Server is busy, please retry shortly.",
+                  "retry_after": e.retry_after})
+        except Exception:
+            send({"id": request_id, "type": "error", "data": "Error fetching answer."})
+        finally:
+            if running.get(request_id, (None,))[0] is asyncio.current_task():
+                del running[request_id]
+
+    def cancel(request_id: str, notify: bool = False):
+        task, deadline = running.pop(request_id, (None, None))
+        if task:
+            # Sent here rather than from the task, so it is queued before any
+            # later message for the same ID, even if the task never started.
+            deadline.cancel()
+            task.cancel()
+            if notify:
+                send({"id": request_id, "type": "cancelled"})
+
+    sender_task = asyncio.create_task(sender())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                request_id = str(message["id"])
+            except (ValueError, KeyError, TypeError):
+                send({"type": "error", "data": "Messages must be JSON objects with an \"id\"."})
+                continue
+            kind = message.get("type", "solve")
+            cancel(request_id, notify=kind == "cancel")
+            if kind == "cancel":
+                continue
+            if kind != "solve":
+                send({"id": request_id, "type": "error", "data": f"Unknown message type {kind!r}."})
+                continue
+            if len(running) >= WS_MAX_INFLIGHT:
+                metrics.incr("ws.rejected")
+                send({"id": request_id, "type": "error", "retry_after": 1,
+                      "data": f"At most {WS_MAX_INFLIGHT} requests in flight per connection."})
+                continue
+            try:
+                request = MathRequest.model_validate(
+                    {k: message[k] for k in ("question", "timeout", "filters") if k in message})
+            except ValidationError as e:
+                send({"id": request_id, "type": "error", "data": str(e)})
+                continue
+            deadline = Deadline(request.timeout)
+            running[request_id] = (asyncio.create_task(handle(request_id, request, deadline)), deadline)
+            send({"id": request_id, "type": "accepted"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for request_id in list(running):
+            cancel(request_id)
+        sender_task.cancel()
+
+def _sample_limited(*args, **kwargs) -> dict:
+    """sample_function holding a SymPy admission slot (parsing and sampling are CPU-bound)."""
+    with limit("sympy"):
+        return sample_function(*args, **kwargs)
+
+@app.post("/plot")
+async def plot_function(request: PlotRequest):
+    if not validate_input(request.expression):
+        raise HTTPException(status_code=400, detail=rejection_message())
+    if not (10 <= request.points <= 10000) or not (10 <= request.max_points <= 20000):
+        raise HTTPException(status_code=400, detail="points and max_points must be between 10 and 10000/20000")
+    if request.format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'binary'")
+    try:
+        sampled = await run_in_threadpool(
+            _sample_limited, request.expression, request.x_min, request.x_max,
+            points=request.points, max_points=request.max_points
+        )
+    except PlotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Exception:
+        raise HTTPException(status_code=500, detail="Error sampling function.")
+
+    xs, ys = sampled["x"], sampled["y"]
+    if request.format == "binary":
+        body = np.concatenate([xs, ys]).astype("<f4").tobytes()
+        return Response(
+            content=body,
+            media_type="application/octet-stream",
+            headers={"X-Points": str(xs.size), "X-Latex": json.dumps(sampled["latex"])}
+        )
+    return {
+        "expression": request.expression,
+        "latex": sampled["latex"],
+        "x": np.round(xs, 6).tolist(),
+        "y": [None if np.isnan(v) else round(float(v), 6) for v in ys],
+        "discontinuities": sampled["discontinuities"],
+    }
 
 @app.post("/feedback", response_model=FeedbackResponse)
 async def submit_feedback(request: FeedbackRequest):
+    if not (1 <= request.rating <= 5):
+        raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
     try:
-        if not (1 <= request.rating <= 5):
-            raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
-        feedback_entry = {
-            "id": f"fb_{datetime.now().timestamp()}",
-            "timestamp": datetime.now().isoformat(),
-            "question": request.question,
-            "answer": request.answer,
-            "rating": request.rating,
-            "comment": request.comment
-        }
-        feedbacks = []
-        if os.path.exists(FEEDBACK_FILE):
-            try:
-                with open(FEEDBACK_FILE, "r") as f:
-                    feedbacks = json.load(f)
-            except json.JSONDecodeError:
-                feedbacks = []
-        feedbacks.append(feedback_entry)
-        with open(FEEDBACK_FILE, "w") as f:
-            json.dump(feedbacks, f, indent=2)
+        feedback_id = store_feedback(
+            request.question, request.answer, request.rating, request.comment,
+            source=request.source, kb_point_id=request.kb_point_id,
+            solution=request.solution, steps=request.steps,
+        )
         return FeedbackResponse(
             status="success",
             message="Feedback submitted successfully",
-            feedback_id=feedback_entry["id"]
+            feedback_id=feedback_id
         )
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to submit feedback")
 
 @app.get("/feedback/stats")
-async def get_feedback_stats():
-    try:
-        if not os.path.exists(FEEDBACK_FILE):
-            return {"total_feedback": 0, "average_rating": 0.0, "ratings_distribution": {}}
-        with open(FEEDBACK_FILE, "r") as f:
-            feedbacks = json.load(f)
-        if not feedbacks:
-            return {"total_feedback": 0, "average_rating": 0.0, "ratings_distribution": {}}
-        total = len(feedbacks)
-        avg_rating = sum(f.get("rating", 0) for f in feedbacks) / total
-        ratings_dist = {i: sum(1 for f in feedbacks if f.get("rating") == i) for i in range(1, 6)}
-        return {
-            "total_feedback": total,
-            "average_rating": round(avg_rating, 2),
-            "ratings_distribution": ratings_dist
-        }
-    except Exception as e:
-        return {
-            "total_feedback": 0,
-            "average_rating": 0.0,
-            "ratings_distribution": {},
-            "error": str(e)
-        }
+async def feedback_stats():
+    return get_feedback_stats()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,209 +1,247 @@
 """
 Math Problem Solver using SymPy
-Handles various math problem types with step-by-step solutions
+Handles various math problem types with step-by-step solutions.
+Each question is parsed once and dispatched on its structure.
 """
 
 import re
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
 import sympy as sp
-from sympy.parsing.sympy_parser import parse_expr
-from sympy import latex
+
+from agent.sympy_cache import cached_parse, symbol_table
 
 class MathSingleton:
     """
-    Singleton class to initialize SymPy symbols only once
+    Singleton handing out SymPy symbols; backed by the shared, size-bounded
+    symbol table so arbitrary variable names can't grow it without limit.
     """
     _instance = None
-    _symbols = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(MathSingleton, cls).__new__(cls)
         return cls._instance
-    
+
     def get_symbols(self, variables: List[str]):
-        if self._symbols is None:
-            self._symbols = {}
-        for var in variables:
-            if var not in self._symbols:
-                self._symbols[var] = sp.Symbol(var)
-        return [self._symbols[v] for v in variables]
+        return symbol_table.get_many(variables)
+
+
+class ParsedQuestion(NamedTuple):
+    """A question parsed once: `expr` is lhs - rhs for equations, else the expression."""
+    text: str
+    expr: sp.Expr
+    is_equation: bool
+    variable: Optional[sp.Symbol]
+    degree: Optional[int]
+
+
+_COMMAND_WORDS = re.compile(r'(solve|calculate|evaluate|find|what is|compute)', re.IGNORECASE)
+_SUPERSCRIPTS = {"²": "**2", "³": "**3"}
+
+
+@lru_cache(maxsize=512)
+def parse_question(question: str) -> Optional[ParsedQuestion]:
+    """
+    Parse a question exactly once with the full transformation set and record
+    the structure the dispatcher needs (equation or not, unknown, degree).
+    Returns None when the text isn't parseable math.
+    """
+    text = _COMMAND_WORDS.sub('', question).strip().strip(':').strip('?').strip()
+    for sup, rep in _SUPERSCRIPTS.items():
+        text = text.replace(sup, rep)
+    if not text or text.count('=') > 1:
+        return None
+    try:
+        if '=' in text:
+            left, right = text.split('=')
+            expr = cached_parse(left, 'all') - cached_parse(right, 'all')
+            is_equation = True
+        else:
+            expr = cached_parse(text, 'all')
+            is_equation = False
+    except Exception:
+        return None
+
+    free = sorted(expr.free_symbols, key=lambda s: s.name)
+    x = symbol_table.get('x')
+    # Solve for x; another letter only when it is the sole unknown of an equation.
+    variable = x if x in free else (free[0] if is_equation and len(free) == 1 else None)
+    degree = None
+    if variable is not None:
+        try:
+            degree = sp.Poly(expr, variable).degree()
+        except sp.PolynomialError:
+            degree = None
+    return ParsedQuestion(text, expr, is_equation, variable, degree)
 
 
 class MathSolver:
+    """
+    Parses each question once (cached) and dispatches on its structure:
+    quadratic equations -> closed form, other equations or expressions in an
+    unknown -> SymPy solve, constant expressions -> numeric evaluation.
+    Every result reports the `branch` that produced it.
+    """
+
     def __init__(self):
         self.symbol_manager = MathSingleton()
-    
+
     def solve(self, question: str) -> Dict:
         """
         Main solving method that routes to specific solvers
         """
-        question = question.strip()
-        
-        # Try quadratic equation solver
-        quad_result = self.solve_quadratic(question)
-        if quad_result["solved"]:
-            return quad_result
-        
-        # Try general equation solver
-        equation_result = self.solve_equation(question)
-        if equation_result["solved"]:
-            return equation_result
-        
-        # Try expression evaluation
-        eval_result = self.evaluate_expression(question)
-        if eval_result["solved"]:
-            return eval_result
-        
-        # Fallback
+        parsed = parse_question(question.strip())
+        if parsed is None:
+            return self._unsolved("unparsed")
+
+        if parsed.is_equation and parsed.variable is not None and parsed.degree == 2:
+            result = self._solve_quadratic(parsed)
+        elif parsed.variable is not None:
+            result = self._solve_equation(parsed)
+            if not result["solved"] and not parsed.is_equation:
+                result = self._evaluate_expression(parsed)
+        else:
+            result = self._evaluate_expression(parsed)
+
+        return result if result["solved"] else self._unsolved(result.get("branch", "unsolved"))
+
+    @staticmethod
+    def _unsolved(branch: str) -> Dict:
         return {
             "solved": False,
             "answer": "I couldn't parse your question. Please try rephrasing it.",
             "steps": [],
             "solution": "",
-            "confidence": 0.0
+            "confidence": 0.0,
+            "branch": branch
         }
-    
+
     def solve_quadratic(self, question: str) -> Dict:
         """
         Solve quadratic equations in the form ax² + bx + c = 0
         """
+        parsed = parse_question(question.strip())
+        if parsed is None or not parsed.is_equation or parsed.degree != 2:
+            return {"solved": False, "branch": "quadratic"}
+        return self._solve_quadratic(parsed)
+
+    def solve_equation(self, question: str) -> Dict:
+        """
+        Solve general equations using SymPy
+        """
+        parsed = parse_question(question.strip())
+        if parsed is None or parsed.variable is None:
+            return {"solved": False, "branch": "equation"}
+        return self._solve_equation(parsed)
+
+    def evaluate_expression(self, question: str) -> Dict:
+        """
+        Evaluate simple mathematical expressions
+        """
+        parsed = parse_question(question.strip())
+        if parsed is None or parsed.is_equation:
+            return {"solved": False, "branch": "evaluate"}
+        return self._evaluate_expression(parsed)
+
+    def _solve_quadratic(self, parsed: ParsedQuestion) -> Dict:
         try:
-            # Extract quadratic equation
-            pattern = r'([-+]?\d*)x²\s*([-+]\s*\d*)x\s*([-+]\s*\d*)\s*=\s*(\d+)'
-            match = re.search(pattern, question)
-            
-            if not match:
-                return {"solved": False}
-            
-            # Parse coefficients
-            a = int(match.group(1)) if match.group(1) and match.group(1) != '-' else 1
-            if match.group(1) == '-':
-                a = -1
-            
-            b_match = match.group(2).replace(' ', '')
-            b = int(b_match)
-            
-            c_match = match.group(3).replace(' ', '')
-            c = int(c_match)
-            
-            constant = int(match.group(4))
-            
-            # Adjust for right-hand side
-            c = c - constant
-            
+            coeffs = sp.Poly(parsed.expr, parsed.variable).all_coeffs()
+            a, b, c = (sp.nsimplify(k) for k in coeffs)
+            if not all(k.is_number for k in (a, b, c)):
+                return self._solve_equation(parsed)
+
             steps = [
                 f"Step 1: Identify coefficients",
                 f"   a = {a}, b = {b}, c = {c}",
                 f"Step 2: Calculate discriminant",
                 f"   Δ = b² - 4ac = ({b})² - 4({a})({c})"
             ]
-            
+
             # Calculate discriminant
             discriminant = b**2 - 4*a*c
             steps.append(f"   Δ = {discriminant}")
-            
+
             if discriminant < 0:
-                solution = f"Complex roots: x = {-b/(2*a)} ± {abs(discriminant)**0.5/(2*a)}i"
+                solution = f"Complex roots: x = {float(-b/(2*a))} ± {float(sp.sqrt(-discriminant)/(2*a))}i"
                 steps.append("Step 3: Discriminant is negative, roots are complex")
             else:
-                x1 = (-b + discriminant**0.5) / (2*a)
-                x2 = (-b - discriminant**0.5) / (2*a)
+                x1 = float((-b + sp.sqrt(discriminant)) / (2*a))
+                x2 = float((-b - sp.sqrt(discriminant)) / (2*a))
                 solution = f"x₁ = {x1:.4f}, x₂ = {x2:.4f}"
                 steps.append(f"Step 3: Apply quadratic formula")
                 steps.append(f"   x = (-b ± √Δ) / 2a")
                 steps.append(f"   x₁ = {-b} + √{discriminant} / {2*a} = {x1:.4f}")
                 steps.append(f"   x₂ = {-b} - √{discriminant} / {2*a} = {x2:.4f}")
-            
+
             steps.append("Step 4: Verify solution")
-            
+
             answer = f"Solution: {solution}"
-            
+
             return {
                 "solved": True,
                 "answer": answer,
                 "steps": steps,
                 "solution": solution,
-                "confidence": 0.95
+                "confidence": 0.95,
+                "branch": "quadratic"
             }
-            
-        except Exception:
-            return {"solved": False}
-    
-    def solve_equation(self, question: str) -> Dict:
-        """
-        Solve general equations using SymPy
-        """
+
+        except (TypeError, ValueError, sp.PolynomialError):
+            return {"solved": False, "branch": "quadratic"}
+
+    def _solve_equation(self, parsed: ParsedQuestion) -> Dict:
         try:
-            # Try to parse equation
-            x = sp.Symbol('x')
-            
-            # Extract equation (assume form: expression = constant)
-            if '=' in question:
-                parts = question.split('=')
-                left = parse_expr(parts[0].replace('x', 'x'), transformations='all')
-                right = parse_expr(parts[1], transformations='all')
-                equation = sp.Eq(left, right)
-            else:
-                equation = parse_expr(question, transformations='all')
-                equation = sp.Eq(equation, 0)
-            
-            # Solve equation
-            solutions = sp.solve(equation, x)
-            
+            equation = sp.Eq(parsed.expr, 0)
+            solutions = sp.solve(equation, parsed.variable)
+
             if solutions:
-                solution_str = ', '.join([f"x = {sol.evalf()}" for sol in solutions])
+                name = parsed.variable.name
+                solution_str = ', '.join([f"{name} = {sol.evalf()}" for sol in solutions])
                 steps = [
                     "Step 1: Parse the equation",
                     f"   Equation: {equation}",
                     "Step 2: Solve using SymPy",
                     "Step 3: Simplify and extract roots"
                 ]
-                
+
                 answer = f"Solutions: {solution_str}"
-                
+
                 return {
                     "solved": True,
                     "answer": answer,
                     "steps": steps,
                     "solution": solution_str,
-                    "confidence": 0.90
+                    "confidence": 0.90,
+                    "branch": "equation"
                 }
-            
-            return {"solved": False}
-            
-        except Exception:
-            return {"solved": False}
-    
-    def evaluate_expression(self, question: str) -> Dict:
-        """
-        Evaluate simple mathematical expressions
-        """
+
+            return {"solved": False, "branch": "equation"}
+
+        except (NotImplementedError, TypeError, ValueError):
+            return {"solved": False, "branch": "equation"}
+
+    def _evaluate_expression(self, parsed: ParsedQuestion) -> Dict:
         try:
-            # Remove common math question words
-            cleaned = re.sub(r'(solve|calculate|evaluate|find|what is|compute)', '', question, flags=re.IGNORECASE)
-            cleaned = cleaned.strip().strip(':').strip('?')
-            
-            # Try to evaluate
-            result = sp.sympify(cleaned).evalf()
-            
+            result = parsed.expr.evalf()
+
             steps = [
                 "Step 1: Parse expression",
-                f"   Expression: {cleaned}",
+                f"   Expression: {parsed.text}",
                 "Step 2: Evaluate",
                 "Step 3: Simplify"
             ]
-            
+
             answer = f"Result: {result}"
-            
+
             return {
                 "solved": True,
                 "answer": answer,
                 "steps": steps,
                 "solution": str(result),
-                "confidence": 0.85
+                "confidence": 0.85,
+                "branch": "evaluate"
             }
-            
-        except Exception:
-            return {"solved": False}
 
+        except (TypeError, ValueError):
+            return {"solved": False, "branch": "evaluate"}
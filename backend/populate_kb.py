@@ -9,6 +9,10 @@ from qdrant_client.models import PointStruct, Distance, VectorParams
 from sentence_transformers import SentenceTransformer
 import sys
 
+from agent.kb_version import bump_kb_version
+from agent.doc_store import store_documents
+from agent.kb_schema import ensure_payload_indexes
+
 # Initialize Qdrant client
 client = QdrantClient(url=os.getenv("QDRANT_URL", "http://localhost:6333"))
 
@@ -67,7 +71,10 @@ print(f"✅ Generated {len(points)} embeddings")
 
 # Upload to Qdrant
 print("\nUploading to Qdrant...")
+ensure_payload_indexes(client, collection_name)
+store_documents(collection_name, points, source="math_dataset")
 client.upsert(collection_name=collection_name, points=points)
+bump_kb_version(collection_name)
 print(f"✅ Successfully uploaded {len(points)} points to Qdrant!")
 
 # Verify upload
@@ -0,0 +1,61 @@
+"""
+Microbenchmark: numeric fast path vs. sympy.solve for polynomials and linear systems.
+
+Run from backend/:  python scripts/bench_fast_solve.py
+Checks that both paths return the same solution set before timing.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy import Symbol, symbols, solve, sympify, N
+
+from agent.fast_solve import solve_polynomial, solve_linear_system
+
+x = Symbol("x")
+POLYNOMIALS = [
+    "2*x + 3 - 7", "x**2 - 5*x + 6", "x**2 + 2*x + 5", "4*x**2 - 4*x + 1",
+    "x**2 - 2", "x**3 - 6*x**2 + 11*x - 6", "x**4 - 5*x**2 + 4",
+    "2*x**3 - 3*x**2 - 11*x + 6", "x**3 - x**2 + x - 1", "x**5 - x",
+]
+UNKNOWNS = symbols("x y z")
+SYSTEMS = [
+    ["x + y - 3", "x - y - 1"],
+    ["2*x + 3*y - z - 1", "x - y + 2*z - 3", "3*x + y + z - 4"],
+    ["x/2 + y/3 - 1", "x - y - 1/6"],
+]
+
+
+def _same(a, b) -> bool:
+    key = lambda v: (round(float(N(v).as_real_imag()[0]), 9), round(float(N(v).as_real_imag()[1]), 9))
+    return sorted(map(key, a)) == sorted(map(key, b))
+
+
+def main():
+    polys = [sympify(p) for p in POLYNOMIALS]
+    systems = [[sympify(e) for e in s] for s in SYSTEMS]
+    unknowns = list(UNKNOWNS)
+
+    for p in polys:
+        fast = solve_polynomial(p, x)
+        assert fast is not None, p
+        assert _same(fast, solve(p, x)), p
+    for s in systems:
+        syms = unknowns[:len(s)]
+        fast = solve_linear_system(s, syms)
+        ref = solve(s, syms, dict=True)[0]
+        assert fast == ref, s
+
+    runs = 5
+    t_fast = timeit.timeit(lambda: [solve_polynomial(p, x) for p in polys], number=runs)
+    t_sympy = timeit.timeit(lambda: [solve(p, x) for p in polys], number=runs)
+    print(f"polynomials ({len(polys)}):  sympy {t_sympy / runs * 1e3:8.1f} ms   fast {t_fast / runs * 1e3:8.1f} ms")
+    t_fast = timeit.timeit(lambda: [solve_linear_system(s, unknowns[:len(s)]) for s in systems], number=runs)
+    t_sympy = timeit.timeit(lambda: [solve(s, unknowns[:len(s)], dict=True) for s in systems], number=runs)
+    print(f"linear systems ({len(systems)}): sympy {t_sympy / runs * 1e3:8.1f} ms   fast {t_fast / runs * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Microbenchmark: compiled guardrails vs. the original per-keyword regex scan.
+
+Run from backend/:  python scripts/bench_guardrails.py
+Checks that every decision and sanitized string is identical before timing.
+"""
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.guardrails import (
+    MATH_KEYWORDS, BANNED_TOPICS, HALLUCINATION_MARKERS,
+    validate_input, validate_batch, sanitize_output,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def legacy_validate_input(question: str) -> bool:
+    if not question or len(question.strip()) < 2:
+        return False
+    q = question.lower()
+    if any(b in q for b in BANNED_TOPICS):
+        return False
+    has_keyword = any(re.search(rf'\b{re.escape(k)}\b', q) for k in MATH_KEYWORDS)
+    has_symbols = bool(re.search(r'[\d\+\-\*/=xyzπ√∑∫∞^()sintcostanlogexp]', q))
+    is_simple_expr = bool(re.match(r'^[\dxyz\+\-\*/\^=\s\(\)]+$', question.strip()))
+    return has_keyword or has_symbols or is_simple_expr
+
+
+def legacy_sanitize_output(answer: str) -> str:
+    if not answer:
+        return ""
+    sanitized = answer
+    for marker in HALLUCINATION_MARKERS:
+        sanitized = re.sub(re.escape(marker), '', sanitized, flags=re.IGNORECASE)
+    sanitized = re.sub(r'\s+', ' ', sanitized).strip()
+    return sanitized
+
+
+def load_corpus():
+    questions, answers = [], []
+    for name in ("kb.json", "jeebench_math.json"):
+        with open(os.path.join(DATA_DIR, name)) as f:
+            for item in json.load(f):
+                questions.append(item.get("question", ""))
+                answers.append(str(item.get("answer") or item.get("gold") or ""))
+    questions += [
+        "", "x", "2x+3=7", "Who won the election?", "how to build a weapon",
+        "What's the weather?", "integrate x^2", "plot sin(x)", "Tell me a joke",
+    ]
+    answers += [
+        "I'm sorry, I cannot help with that.", "I'm Sorry, I don't know x = 2",
+        "I cannot help   you", "The answer is 4.",
+    ]
+    return questions, answers
+
+
+def main():
+    questions, answers = load_corpus()
+
+    for q in questions:
+        assert validate_input(q) == legacy_validate_input(q), q
+    assert validate_batch(questions) == [legacy_validate_input(q) for q in questions]
+    for a in answers:
+        assert sanitize_output(a) == legacy_sanitize_output(a), a
+    print(f"✅ Identical decisions on {len(questions)} questions / {len(answers)} answers")
+
+    runs = 20
+    cases = [
+        ("validate (legacy)", lambda: [legacy_validate_input(q) for q in questions]),
+        ("validate (compiled)", lambda: [validate_input(q) for q in questions]),
+        ("validate_batch", lambda: validate_batch(questions)),
+        ("sanitize (legacy)", lambda: [legacy_sanitize_output(a) for a in answers]),
+        ("sanitize (compiled)", lambda: [sanitize_output(a) for a in answers]),
+    ]
+    for label, fn in cases:
+        seconds = min(timeit.repeat(fn, number=runs, repeat=3)) / runs
+        print(f"{label:<22} {seconds * 1e3:8.3f} ms per pass")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: legacy KB search (sync REST client, get_collections before every
+search, full payloads) vs. agent/kb_client.py (cached metadata, async client
+with gRPC preferred, router payload fields only).
+
+Run from backend/ with Qdrant up:  python scripts/bench_kb_client.py [--queries 200]
+Query vectors are taken from stored points, so no embedding model is needed.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import SearchParams
+
+from agent.kb_client import KBClient, QDRANT_URL
+
+
+def _summary(name, latencies, round_trips, payload_bytes, n):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:8} p50 {statistics.median(latencies) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms   "
+          f"round trips/query {round_trips / n:4.2f}   payload/query {payload_bytes / n / 1024:6.1f} KiB")
+
+
+def legacy(client, collection, vectors):
+    latencies, trips, payload = [], 0, 0
+    for vector in vectors:
+        start = time.perf_counter()
+        collections = client.get_collections()
+        assert any(c.name == collection for c in collections.collections)
+        hits = client.query_points(
+            collection_name=collection, query=vector, limit=3,
+            search_params=SearchParams(hnsw_ef=128), with_payload=True,
+        ).points
+        latencies.append(time.perf_counter() - start)
+        trips += 2
+        payload += sum(len(json.dumps(h.payload)) for h in hits)
+    return latencies, trips, payload
+
+
+def layered(kb, collection, vectors):
+    latencies, payload = [], 0
+    before = kb.round_trips
+    for vector in vectors:
+        start = time.perf_counter()
+        assert kb.collection_info_sync(collection)["exists"]
+        hits = kb.search_sync(collection, vector, limit=3)
+        latencies.append(time.perf_counter() - start)
+        payload += sum(len(json.dumps(h.payload)) for h in hits)
+    return latencies, kb.round_trips - before, payload
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collection", default="math_kb")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rest = QdrantClient(url=QDRANT_URL)
+    points, _ = rest.scroll(args.collection, limit=args.queries, with_vectors=True, with_payload=False)
+    if not points:
+        sys.exit(f"Collection {args.collection!r} is empty")
+    vectors = [list(p.vector) for p in points]
+    vectors = (vectors * (args.queries // len(vectors) + 1))[:args.queries]
+
+    kb_rest = KBClient(prefer_grpc=False)
+    kb_grpc = KBClient(prefer_grpc=True)
+    for kb in (kb_rest, kb_grpc):  # connect + warm metadata outside the timing
+        kb.collection_info_sync(args.collection)
+        kb.search_sync(args.collection, vectors[0])
+
+    print(f"{len(vectors)} queries against {QDRANT_URL}/{args.collection}")
+    _summary("legacy", *legacy(rest, args.collection, vectors), len(vectors))
+    _summary("rest", *layered(kb_rest, args.collection, vectors), len(vectors))
+    _summary("grpc", *layered(kb_grpc, args.collection, vectors), len(vectors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Measure memory and throughput of server.py for several worker counts.
+
+Run from backend/ (Qdrant optional; KB misses fall through to SymPy):
+    python scripts/bench_workers.py --workers 1 2 4 --seconds 20
+
+RSS double counts pages shared copy-on-write with the parent, so PSS
+(proportional set size, from /proc/<pid>/smaps_rollup) is reported as well;
+the sum of PSS is the real memory footprint of the whole server.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS = [
+    "Solve 2x + 3 = 7",
+    "x^2 - 5x + 6 = 0",
+    "integrate x^2",
+    "differentiate sin(x)*x^3",
+    "What is the Laplace transform of t^3?",
+]
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def _memory_kb(pid: int) -> tuple:
+    rss = pss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return rss, pss
+
+
+def _wait_ready(url: str, timeout: float = 180.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("server did not become ready")
+
+
+def _load(url: str, seconds: float, concurrency: int) -> tuple:
+    stop = time.time() + seconds
+
+    def run(i):
+        done = errors = 0
+        with httpx.Client(timeout=60.0) as http:
+            while time.time() < stop:
+                q = QUESTIONS[(i + done) % len(QUESTIONS)]
+                try:
+                    http.post(f"{url}/solve", json={"question": q}).raise_for_status()
+                    done += 1
+                except httpx.HTTPError:
+                    errors += 1
+        return done, errors
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(run, range(concurrency)))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def bench(workers: int, port: int, seconds: float, concurrency: int) -> dict:
+    proc = subprocess.Popen(
+        [sys.executable, "server.py", "--workers", str(workers), "--port", str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url)
+        pids = [proc.pid] + _children(proc.pid)
+        done, errors = _load(url, seconds, concurrency)
+        mem = [_memory_kb(p) for p in pids]
+        return {
+            "workers": workers,
+            "rss_mb": sum(m[0] for m in mem) / 1024,
+            "pss_mb": sum(m[1] for m in mem) / 1024,
+            "worker_pss_mb": sum(m[1] for m in mem[1:]) / 1024 / max(1, workers),
+            "req_per_s": done / seconds,
+            "errors": errors,
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'sum RSS MB':>11} {'sum PSS MB':>11} {'PSS/worker':>11} {'req/s':>8} {'errors':>7}")
+    for n in args.workers:
+        r = bench(n, args.port, args.seconds, args.concurrency)
+        print(f"{r['workers']:>7} {r['rss_mb']:>11.1f} {r['pss_mb']:>11.1f} "
+              f"{r['worker_pss_mb']:>11.1f} {r['req_per_s']:>8.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,11 @@
 import json
 import os
+import sys
 
-KB_PATH = "backend/data/kb.json"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.markdown import render_markdown, escape_markdown
 
-def escape_markdown(text: str) -> str:
-    """Escape markdown for safe JSON storage."""
-    return json.dumps(text)[1:-1]
+KB_PATH = "backend/data/kb.json"
 
 def to_kb_entry(fallback: dict) -> dict:
     """Convert DSPy fallback result to KB format."""
@@ -16,11 +16,7 @@ def to_kb_entry(fallback: dict) -> dict:
         "steps": fallback["steps"],
         "confidence": fallback["confidence"],
         "source": "DSPy fallback",
-        "markdown": escape_markdown(
-            f"## ✅ Final Answer\n\n{fallback['solution']}\n\n" +
-            "## 🧠 Step-by-Step Breakdown\n" +
-            "\n".join([f"### Step {i+1}\n{step}" for i, step in enumerate(fallback["steps"])])
-        )
+        "markdown": escape_markdown(render_markdown(fallback["solution"], fallback["steps"]))
     }
 
 def cache_fallback(fallback: dict):
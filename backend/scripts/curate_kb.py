@@ -0,0 +1,31 @@
+"""
+Feedback-driven KB curation job (agent/curation.py): quarantine or demote
+low-rated KB entries, promote highly rated solver answers into the KB, and
+report the expected KB hit-rate change. Only feedback added since the last
+run is read.
+
+Run from backend/ with Qdrant up, e.g. hourly from cron:
+    python scripts/curate_kb.py [--collection math_kb] [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.curation import run_curation
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collection", default="math_kb")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    report = run_curation(args.collection, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Evaluate the routing pre-router on our datasets.
+
+Run from backend/:
+    python scripts/eval_prerouter.py            # classification + planned stage skips
+    python scripts/eval_prerouter.py --compare  # also run both stage orders and diff answers
+
+--compare needs the same services as the API (Qdrant for the KB stage). It
+runs every question through the classified order and through the legacy
+KB -> SymPy -> transform order, counting stages executed and answer mismatches.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import routing
+from agent.routing import (
+    classify_question, run_stages, normalize_input, STAGE_ORDER, LEGACY_STAGE_ORDER,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASETS = ["data/kb.json", "data/jeebench_math.json", "math_dataset.json"]
+EXTRA = [
+    "2x+3=7", "x^2 - 5x + 6 = 0", "integrate x^2", "differentiate sin(x)",
+    "What is the Laplace transform of t^3?", "Solve 3x² - 7x + 2 = 0",
+]
+
+
+def load_questions():
+    questions = []
+    for rel in DATASETS:
+        with open(os.path.join(BACKEND_DIR, rel)) as f:
+            questions += [item["question"] for item in json.load(f) if item.get("question")]
+    return questions + EXTRA
+
+
+def _counting(stages: dict, stats: Counter):
+    wrapped = {}
+    for name, fn in stages.items():
+        def run(question, deadline, kb_filters=None, on_event=None, _fn=fn, _name=name):
+            stats[_name] += 1
+            return _fn(question, deadline, kb_filters, on_event)
+        wrapped[name] = run
+    return wrapped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    questions = [normalize_input(q) for q in load_questions()]
+    types = [classify_question(q) for q in questions]
+
+    print(f"📊 {len(questions)} questions")
+    for qtype, n in Counter(types).most_common():
+        skipped = [s for s in LEGACY_STAGE_ORDER if s not in STAGE_ORDER[qtype]]
+        print(f"  {qtype:<13} {n:>4}  order={'→'.join(STAGE_ORDER[qtype]):<18} skips={','.join(skipped) or '-'}")
+    kb_skipped = sum(1 for t in types if STAGE_ORDER[t][0] != "kb")
+    sympy_skipped = sum(1 for t in types if "sympy" not in STAGE_ORDER[t])
+    print(f"  KB no longer first for {kb_skipped}, SymPy never run for {sympy_skipped}")
+
+    if not args.compare:
+        return
+
+    original = routing.STAGES
+    legacy_stats, routed_stats = Counter(), Counter()
+    mismatches = []
+    timings = {"legacy": 0.0, "routed": 0.0}
+    try:
+        for q, qtype in zip(questions, types):
+            routing.STAGES = _counting(original, legacy_stats)
+            t0 = time.perf_counter()
+            legacy = run_stages(q, LEGACY_STAGE_ORDER)
+            timings["legacy"] += time.perf_counter() - t0
+
+            routing.STAGES = _counting(original, routed_stats)
+            t0 = time.perf_counter()
+            routed = run_stages(q, STAGE_ORDER[qtype])
+            timings["routed"] += time.perf_counter() - t0
+
+            if legacy["solution"] != routed["solution"]:
+                mismatches.append((qtype, q, legacy["source"], routed["source"]))
+    finally:
+        routing.STAGES = original
+
+    print("\n⚖️  Stage executions (legacy vs routed)")
+    for name in original:
+        print(f"  {name:<8} {legacy_stats[name]:>5} → {routed_stats[name]:>5}")
+    print(f"  total time {timings['legacy']:.2f}s → {timings['routed']:.2f}s")
+    print(f"\n{'✅' if not mismatches else '⚠️'} {len(mismatches)} answers differ")
+    for qtype, q, a, b in mismatches[:20]:
+        print(f"  [{qtype}] {q[:70]!r}: {a} → {b}")
+
+
+if __name__ == "__main__":
+    main()
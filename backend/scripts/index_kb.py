@@ -2,6 +2,13 @@ import json
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct, VectorParams, Distance
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.kb_version import bump_kb_version
+from agent.doc_store import store_documents
+from agent.kb_schema import ensure_payload_indexes
 
 model = SentenceTransformer("all-MiniLM-L6-v2")
 
@@ -22,4 +29,7 @@ points = [
     for i, embedding in enumerate(embeddings)
 ]
 
+ensure_payload_indexes(client, "math_kb")
+store_documents("math_kb", points)
 client.upsert(collection_name="math_kb", points=points)
+bump_kb_version("math_kb")
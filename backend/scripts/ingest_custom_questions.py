@@ -2,6 +2,13 @@ from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.kb_version import bump_kb_version
+from agent.doc_store import store_documents
+from agent.kb_schema import ensure_payload_indexes
 
 custom_questions = [
     {
@@ -42,7 +49,10 @@ def ingest_custom():
         }
         points.append(PointStruct(id=90000 + i, vector=vector, payload=payload))
 
+    ensure_payload_indexes(client, "math_kb")
+    store_documents("math_kb", points)
     client.upsert(collection_name="math_kb", points=points)
+    bump_kb_version("math_kb")
     print("✅ Custom questions added to Qdrant.")
 
 if __name__ == "__main__":
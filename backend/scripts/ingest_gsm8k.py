@@ -5,6 +5,12 @@ from qdrant_client.models import PointStruct, VectorParams, Distance
 from tqdm import tqdm
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.kb_version import bump_kb_version
+from agent.doc_store import store_documents
+from agent.kb_schema import ensure_payload_indexes
 
 def ingest_gsm8k():
     # Load dataset and embedding model
@@ -41,15 +47,20 @@ def ingest_gsm8k():
 
         points.append(PointStruct(id=i + 20000, vector=vector, payload=payload))
 
+    entries = [p.payload for p in points]
+    ensure_payload_indexes(client, "math_kb")
+    store_documents("math_kb", points)
+
     # Batch upsert to Qdrant
     for i in range(0, len(points), 500):
         batch = points[i:i+500]
         client.upsert(collection_name="math_kb", points=batch)
+    bump_kb_version("math_kb")
 
     # Optional: Save to local JSON for inspection
     os.makedirs("backend/data", exist_ok=True)
     with open("backend/data/math_dataset.json", "w") as f:
-        json.dump([p.payload for p in points], f, indent=2)
+        json.dump(entries, f, indent=2)
 
     print(f"✅ Embedded {len(points)} GSM8K questions into Qdrant.")
 
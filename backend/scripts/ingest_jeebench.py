@@ -3,6 +3,13 @@ from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct, VectorParams, Distance
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.kb_version import bump_kb_version
+from agent.doc_store import store_documents
+from agent.kb_schema import ensure_payload_indexes
 
 # Load JEEBench dataset
 dataset = load_dataset("daman1209arora/jeebench", split="test")
@@ -37,4 +44,7 @@ for i, item in enumerate(tqdm(dataset, desc="Embedding JEEBench")):
     points.append(PointStruct(id=i, vector=vector, payload=payload))
 
 # Upload to Qdrant
+ensure_payload_indexes(client, "math_kb")
+store_documents("math_kb", points, source="jeebench")
 client.upsert(collection_name="math_kb", points=points)
+bump_kb_version("math_kb")
@@ -5,6 +5,12 @@ from qdrant_client.models import PointStruct, VectorParams, Distance
 from tqdm import tqdm
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.kb_version import bump_kb_version
+from agent.doc_store import store_documents
+from agent.kb_schema import ensure_payload_indexes
 
 def ingest_pw2025():
     dataset = load_dataset("PhysicsWallahAI/JEE-Main-2025-Math", "jan", split="test")
@@ -43,10 +49,13 @@ def ingest_pw2025():
         PointStruct(id=i + 10000, vector=vectors[i], payload=formatted[i])
         for i in range(len(formatted))
     ]
+    ensure_payload_indexes(client, "math_kb")
+    store_documents("math_kb", points)
 
     for i in range(0, len(points), 500):
         batch = points[i:i+500]
         client.upsert(collection_name="math_kb", points=batch)
+    bump_kb_version("math_kb")
 
     os.makedirs("backend/data", exist_ok=True)
     with open("backend/data/math_dataset.json", "a") as f:
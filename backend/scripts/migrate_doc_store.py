@@ -0,0 +1,55 @@
+"""
+Move an existing collection's full payloads into the local doc store
+(agent/doc_store.py), normalized (agent/kb_schema.py), shrink the Qdrant
+payloads to SLIM_FIELDS and create the payload indexes.
+
+Run from backend/ with Qdrant up:  python scripts/migrate_doc_store.py [--collection math_kb] [--dry-run]
+Safe to re-run: points whose payload is already slim keep their stored document.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import QdrantClient
+
+from agent.doc_store import doc_store, slim_payload, SLIM_FIELDS
+from agent.kb_schema import normalize_payload, ensure_payload_indexes
+from agent.kb_client import QDRANT_URL
+from agent.kb_version import bump_kb_version
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collection", default="math_kb")
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=QDRANT_URL)
+    offset, moved, skipped = None, 0, 0
+    while True:
+        points, offset = client.scroll(args.collection, limit=args.batch, offset=offset,
+                                       with_payload=True, with_vectors=False)
+        full = [p for p in points if set(p.payload) - set(SLIM_FIELDS)]
+        skipped += len(points) - len(full)
+        if full and not args.dry_run:
+            entries = [(p.id, normalize_payload(p.payload)) for p in full]
+            doc_store.put_many(args.collection, entries)
+            for point_id, entry in entries:
+                client.overwrite_payload(args.collection, payload=slim_payload(entry), points=[point_id])
+        moved += len(full)
+        if offset is None:
+            break
+
+    print(f"{'🔎 Would move' if args.dry_run else '✅ Moved'} {moved} documents "
+          f"({skipped} already slim) from '{args.collection}'")
+    if not args.dry_run:
+        ensure_payload_indexes(client, args.collection)
+        if moved:
+            bump_kb_version(args.collection)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,13 @@
 import json
+import os
+import sys
 
-def format_markdown(entry):
-    raw = f"""## ✅ Final Answer
-\
-
-\[
-{entry['solution']}
-\\]
-
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.markdown import render_markdown, escape_markdown
 
-
-## 🧠 Step-by-Step Breakdown
-""" + "\n".join([f"### Step {i+1}\n{step}" for i, step in enumerate(entry["steps"])])
+def format_markdown(entry):
     # Escape backslashes and newlines
-    return json.dumps(raw)[1:-1]  # removes outer quotes
+    return escape_markdown(render_markdown(entry["solution"], entry["steps"]))
 
 with open("backend/data/kb.json", "r") as f:
     kb = json.load(f)
@@ -3,6 +3,12 @@ from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.models import PointStruct
 import json, os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.kb_version import bump_kb_version
+from agent.doc_store import store_documents
+from agent.kb_schema import ensure_payload_indexes
 
 # ✅ Step 1: Extract math-only questions from JEEBench
 print("📦 Loading JEEBench dataset...")
@@ -36,5 +42,8 @@ for i, item in enumerate(math_only):
     points.append(PointStruct(id=i, vector=vector, payload=payload))
 
 print(f"📤 Upserting {len(points)} entries into Qdrant collection 'math_kb'...")
+ensure_payload_indexes(client, "math_kb")
+store_documents("math_kb", points)
 client.upsert(collection_name="math_kb", points=points)
+bump_kb_version("math_kb")
 print("✅ Upsert complete.")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Math Routing Agent API.
+
+The parent process imports the app (which loads the embedding model and the
+torch runtime), warms SymPy, binds the listening socket and then forks the
+workers. Everything loaded before the fork is shared copy-on-write, so adding
+a worker costs only its private heap instead of another copy of the model.
+
+Usage (from backend/):
+    python server.py --workers 4 --port 8000
+
+`python main.py` / `uvicorn main:app --reload` remain the development entry
+points.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Before main/agent are imported: they read their settings at import time.
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("server")
+
+WARMUP_QUESTIONS = [
+    "2x + 3 = 7",
+    "x^2 - 5x + 6 = 0",
+    "integrate x^2",
+    "differentiate sin(x)",
+]
+
+
+def _default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", max(1, (os.cpu_count() or 1) // 2)))
+
+
+def _default_threads(workers: int) -> int:
+    return int(os.getenv("TORCH_THREADS_PER_WORKER", max(1, (os.cpu_count() or 1) // workers)))
+
+
+def preload():
+    """Import the app and warm every lazily initialised dependency."""
+    # Keep the parent single-threaded: forking after an OpenMP pool has been
+    # started can deadlock the children's first parallel region.
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = "1"
+
+    from main import app
+    from agent import knowledge_base
+    from agent.routing import solver
+
+    if knowledge_base.model is not None:
+        knowledge_base.model.encode("warmup")
+        logger.info("✅ Embedding model warmed")
+
+    for question in WARMUP_QUESTIONS:
+        solver.solve_equation(question)
+    logger.info("✅ SymPy warmed")
+
+    # Move everything allocated so far out of the GC's generations so
+    # collections in the workers don't write to (and un-share) those pages.
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, threads: int):
+    import uvicorn
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not pin torch threads: {e}")
+
+    config = uvicorn.Config(app, log_level="info", access_log=False)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            _run_worker(app, sock, threads)
+        finally:
+            os._exit(0)
+    logger.info(f"👷 Worker {pid} started ({threads} torch threads)")
+    return pid
+
+
+def serve(host: str, port: int, workers: int, threads: int):
+    app = preload()
+    sock = _bind(host, port)
+    logger.info(f"🚀 Listening on {host}:{port} with {workers} workers")
+
+    children = {_spawn(app, sock, threads) for _ in range(workers)}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.warning(f"⚠️ Worker {pid} exited with status {status}; restarting")
+            time.sleep(1)
+            children.add(_spawn(app, sock, threads))
+
+    sock.close()
+    logger.info("👋 All workers stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with preloaded, forked workers.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=_default_workers())
+    parser.add_argument("--threads", type=int, default=None,
+                        help="torch intra-op threads per worker (default: cpus // workers)")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("server.py needs os.fork(); use `uvicorn main:app` on this platform.")
+
+    threads = args.threads or _default_threads(args.workers)
+    serve(args.host, args.port, args.workers, threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests run from backend/ or the repo root; the agent package lives in backend/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
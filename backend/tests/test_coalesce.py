@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from agent.coalesce import SingleFlight
+from agent.deadline import Deadline
+
+
+def _pipeline(started: list, seconds: float):
+    """A stand-in for route_question: returns whether its deadline survived `seconds`."""
+    async def make(shared: Deadline):
+        started.append(shared)
+        await asyncio.sleep(seconds)
+        return {"deadline_left": shared.remaining(), "cancelled": shared.cancelled}
+    return make
+
+
+def test_short_leader_timeout_does_not_cut_a_longer_joiner_short():
+    async def scenario():
+        flight, started = SingleFlight("test"), []
+        make = _pipeline(started, 0.3)
+        leader_deadline, joiner_deadline = Deadline(0.1), Deadline(5.0)
+        leader = asyncio.ensure_future(
+            asyncio.wait_for(flight.run("q", make, leader_deadline), leader_deadline.remaining()))
+        joiner = asyncio.ensure_future(flight.run("q", make, joiner_deadline))
+        results = await asyncio.gather(leader, joiner, return_exceptions=True)
+        return started, results
+
+    started, (leader, joiner) = asyncio.run(scenario())
+    assert len(started) == 1
+    assert isinstance(leader, asyncio.TimeoutError)
+    assert not joiner["cancelled"]
+    assert joiner["deadline_left"] > 4.0
+
+
+def test_shared_deadline_is_extended_to_the_latest_waiter():
+    async def scenario():
+        flight, started = SingleFlight("test"), []
+        make = _pipeline(started, 0.05)
+        short, long = Deadline(1.0), Deadline(10.0)
+        await asyncio.gather(flight.run("q", make, short), flight.run("q", make, long))
+        return started[0], long
+
+    shared, long = asyncio.run(scenario())
+    assert shared.expires_at == long.expires_at
+
+
+def test_shared_deadline_is_cancelled_when_every_waiter_leaves():
+    async def scenario():
+        flight, started = SingleFlight("test"), []
+        make = _pipeline(started, 1.0)
+        waits = [asyncio.ensure_future(flight.run("q", make, Deadline(5.0))) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        waits[0].cancel()
+        await asyncio.sleep(0.01)
+        still_running = not started[0].cancelled
+        waits[1].cancel()
+        await asyncio.sleep(0.01)
+        return still_running, started[0].cancelled
+
+    still_running, cancelled = asyncio.run(scenario())
+    assert still_running
+    assert cancelled
+
+
+def test_every_caller_gets_the_same_result():
+    async def scenario():
+        flight, calls = SingleFlight("test"), []
+
+        async def make(shared):
+            calls.append(time.monotonic())
+            await asyncio.sleep(0.05)
+            return {"answer": 42}
+
+        return calls, await asyncio.gather(*(flight.run("q", make, Deadline(5.0)) for _ in range(5)))
+
+    calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"answer": 42}] * 5
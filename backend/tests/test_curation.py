@@ -0,0 +1,64 @@
+import pytest
+
+from agent import curation
+from agent.answer_cache import AnswerCache
+
+KB_VERSION = "v1"
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    cache = AnswerCache(path=str(tmp_path / "answers.sqlite3"))
+    monkeypatch.setattr(curation, "answer_cache", cache)
+    return cache
+
+
+def _rating(question, rating, **extra):
+    return {"question": question, "answer": "anything", "rating": rating, **extra}
+
+
+def test_uncached_questions_cannot_quarantine_a_kb_point(served):
+    state = curation._empty_state()
+    forged = [_rating(f"made up question {i}", 1, source="knowledge_base", kb_point_id="42") for i in range(5)]
+
+    unattributed = curation.ingest_feedback(state, forged, KB_VERSION)
+
+    assert unattributed == 5
+    assert state["kb"] == {}
+    assert curation.plan(state)["quarantine"] == []
+
+
+def test_claimed_point_must_match_the_served_one(served):
+    served.put("What is the derivative of x^2?", KB_VERSION,
+               {"answer": "2x", "solution": "2x", "source": "knowledge_base", "kb_point_id": "7"})
+    state = curation._empty_state()
+    forged = [_rating("what is the derivative of x^2", 1, source="knowledge_base", kb_point_id="42")] * 3
+
+    assert curation.ingest_feedback(state, forged, KB_VERSION) == 3
+    assert "42" not in state["kb"] and "7" not in state["kb"]
+
+
+def test_ratings_of_a_served_kb_answer_quarantine_its_point(served):
+    served.put("What is the derivative of x^2?", KB_VERSION,
+               {"answer": "3x", "solution": "3x", "source": "knowledge_base", "kb_point_id": "7"})
+    state = curation._empty_state()
+    ratings = [_rating("what is the derivative of x^2", 1, kb_point_id="7")] * 2
+    ratings.append(_rating("What is the derivative of x^2?", 1))
+
+    assert curation.ingest_feedback(state, ratings, KB_VERSION) == 0
+    assert state["kb"]["7"] == {"n": 3, "sum": 3}
+    assert curation.plan(state)["quarantine"] == ["7"]
+
+
+def test_promotion_uses_the_served_answer_not_the_feedback_text(served):
+    served.put("Solve x^2 - 4 = 0", KB_VERSION,
+               {"answer": "x = -2, 2", "solution": "-2, 2", "steps": ["Factor"], "source": "sympy"})
+    state = curation._empty_state()
+    forged = _rating("solve x^2 - 4 = 0", 5, source="sympy", solution="EVIL", steps=["EVIL"])
+
+    curation.ingest_feedback(state, [forged, forged], KB_VERSION)
+
+    (key,) = curation.plan(state)["promote"]
+    candidate = state["candidates"][key]
+    assert candidate["solution"] == "-2, 2"
+    assert candidate["steps"] == ["Factor"]
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+SLOW, FAST = "solve x^2 = 4", "solve x + 1 = 2"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fake_solve(question, deadline, kb_filters, on_event):
+        await asyncio.sleep(1.0 if question == SLOW else 0.05)
+        return {"answer": question, "steps": [], "solution": question, "confidence": 1.0, "source": "sympy"}
+
+    monkeypatch.setattr(main, "solve_with_events", fake_solve)
+    return TestClient(main.app)
+
+
+def _until(ws, done):
+    messages = []
+    while True:
+        message = ws.receive_json()
+        messages.append(message)
+        if done(message):
+            return messages
+
+
+def test_superseding_an_id_sends_nothing_for_the_old_run(client):
+    with client.websocket_connect("/ws/solve") as ws:
+        ws.send_json({"type": "solve", "id": "q", "question": SLOW})
+        ws.send_json({"type": "solve", "id": "q", "question": FAST})
+        messages = _until(ws, lambda m: m["type"] == "result")
+
+    assert [m["type"] for m in messages] == ["accepted", "accepted", "result"]
+    assert messages[-1]["answer"] == FAST
+
+
+def test_cancel_is_acknowledged_before_a_reused_id_is_accepted(client):
+    with client.websocket_connect("/ws/solve") as ws:
+        ws.send_json({"type": "solve", "id": "q", "question": SLOW})
+        ws.send_json({"type": "cancel", "id": "q"})
+        ws.send_json({"type": "solve", "id": "q", "question": FAST})
+        messages = _until(ws, lambda m: m["type"] == "result")
+
+    assert [m["type"] for m in messages] == ["accepted", "cancelled", "accepted", "result"]
+    assert all(m["id"] == "q" for m in messages)
+    assert messages[-1]["answer"] == FAST